@@ -6,16 +6,31 @@ except AttributeError:
 else:
     ssl._create_default_https_context = _create_unverified_https_context
 
-from flask import Flask, request, send_file, jsonify, url_for
+from flask import Flask, request, send_file, jsonify, url_for, Response
+import json
+import multiprocessing
 import os
 import threading
 import uuid
 import time
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from werkzeug.serving import is_running_from_reloader
+from werkzeug.exceptions import RequestEntityTooLarge
+from job_queue import JobQueue
+from job_events import JobEvents
+from timings import TimingAggregator
+from retention import RetentionManager
+import metrics
+import result_cache
+from werkzeug.datastructures import FileStorage
+from uploads import (streaming_request_class, upload_size, commit_upload,
+                     ChunkedUploadStore, UploadSessionError, DEFAULT_CHUNK_SIZE)
 
 # IMPROVED: Better import handling with fallbacks
 try:
-    from squat_counter import process_squat_video
+    from squat_counter import (process_squat_video, render_squat_video, analyze_squat_landmarks,
+                               ANALYZER_VERSION as SQUAT_ANALYZER_VERSION, DEFAULT_THRESHOLDS as SQUAT_THRESHOLDS)
     print("✅ squat_counter imported successfully")
     SQUAT_AVAILABLE = True
 except ImportError as e:
@@ -23,7 +38,8 @@ except ImportError as e:
     SQUAT_AVAILABLE = False
 
 try:
-    from pushup_counter import process_pushup_video
+    from pushup_counter import (process_pushup_video, render_pushup_video, analyze_pushup_landmarks,
+                                ANALYZER_VERSION as PUSHUP_ANALYZER_VERSION, DEFAULT_THRESHOLDS as PUSHUP_THRESHOLDS)
     print("✅ pushup_counter imported successfully")
     PUSHUP_AVAILABLE = True
 except ImportError as e:
@@ -38,6 +54,35 @@ except ImportError as e:
     print(f"❌ validation not available: {e}")
     VALIDATION_AVAILABLE = False
 
+try:
+    from landmark_store import landmarks_path_for
+    LANDMARKS_AVAILABLE = True
+except ImportError as e:
+    print(f"❌ landmark_store not available: {e}")
+    LANDMARKS_AVAILABLE = False
+
+try:
+    from telemetry import telemetry_path_for, iter_csv
+    TELEMETRY_AVAILABLE = True
+except ImportError as e:
+    print(f"❌ telemetry not available: {e}")
+    TELEMETRY_AVAILABLE = False
+
+try:
+    from video_pipeline import HLS_RENDITIONS
+    from video_encoder import hls_dir_for, HLS_MASTER_PLAYLIST
+    HLS_AVAILABLE = bool(HLS_RENDITIONS)
+except ImportError as e:
+    print(f"❌ video_pipeline not available, HLS output disabled: {e}")
+    HLS_AVAILABLE = False
+
+try:
+    from pose_workers import PoseWorkerPool
+    POSE_WORKERS_AVAILABLE = True
+except ImportError as e:
+    print(f"❌ pose_workers not available: {e}")
+    POSE_WORKERS_AVAILABLE = False
+
 import logging
 
 app = Flask(__name__)
@@ -50,6 +95,35 @@ PROCESSED_FOLDER = 'processed'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
 
+# Number of videos processed concurrently; further uploads wait in a FIFO queue
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', 2))
+# 'thread' runs jobs in the Flask process; 'process' runs them in a pool of
+# MAX_WORKERS long-lived worker processes that keep their Pose graph warm
+EXECUTION_MODE = os.environ.get('EXECUTION_MODE', 'thread').lower()
+
+# Results of identical uploads are served from a content-addressed, size-bounded cache
+CACHE_FOLDER = os.environ.get('CACHE_FOLDER', 'cache')
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_MB', 2048)) * 1024 * 1024
+
+# Uploads are streamed straight into UPLOAD_FOLDER and aborted once they exceed the size limit;
+# requests whose declared length is already too large are rejected before any body is read
+UPLOAD_MAX_BYTES = MAX_FILE_SIZE if VALIDATION_AVAILABLE else 100 * 1024 * 1024
+app.request_class = streaming_request_class(UPLOAD_FOLDER, UPLOAD_MAX_BYTES)
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 1024 * 1024  # room for the other form fields
+
+# Files of a finished job (upload, processed video, landmarks, telemetry, HLS) are removed
+# RETENTION_SECONDS after it finished, together with the job record; when uploads and processed
+# files exceed STORAGE_MAX_MB, the least recently used finished jobs are removed first
+RETENTION_SECONDS = int(os.environ.get('RETENTION_SECONDS', 7200))
+STORAGE_MAX_BYTES = int(os.environ.get('STORAGE_MAX_MB', 10240)) * 1024 * 1024
+
+# Cache-Control max-age of /processed videos (seconds)
+PROCESSED_MAX_AGE = int(os.environ.get('PROCESSED_MAX_AGE', 3600))
+
+# /result long-poll and event stream limits
+LONG_POLL_MAX_SECONDS = 60
+EVENT_STREAM_HEARTBEAT_SECONDS = 15
+
 # Creates standardised error response 
 def error_response(message, status_code):
     return jsonify({
@@ -70,8 +144,10 @@ def validate_upload_request(request):
         raise Exception("No file selected")
     return video
 
-def validate_video_file(video):
+def validate_video_file(video, file_size=None):
     """Basic video file validation"""
+    if file_size == 0:
+        raise Exception("Video file is empty")
     allowed_extensions = ['mp4', 'mov', 'avi', 'mkv', 'webm', '3gp']
     if video.filename:
         ext = video.filename.rsplit('.', 1)[1].lower()
@@ -108,19 +184,175 @@ def mock_pushup_analysis():
 
 # In-memory job store
 jobs = {}
+# Wakes /result long-polls and event streams when a job changes
+job_events = JobEvents()
+# Per-stage processing time summed over finished jobs (GET /timings)
+timing_stats = TimingAggregator()
+
+def forget_job(job_id):
+    """Drop a job record whose files were removed by the retention manager"""
+    job = jobs.pop(job_id, None)
+    if job is None:
+        return
+    jobs_by_status.dec(status=job["status"])
+    job_events.forget(job_id)
+    if job.get("output_path"):
+        with lazy_render_lock:
+            lazy_renders.pop(os.path.basename(job["output_path"]), None)
 
-def process_video_async(job_id, input_path, output_path, video_url, exercise_type="squat"):
+def job_artifacts(output_path):
+    """Files a job may write next to its processed video"""
+    paths = [output_path]
+    if LANDMARKS_AVAILABLE:
+        paths.append(landmarks_path_for(output_path))
+    if TELEMETRY_AVAILABLE:
+        paths.append(telemetry_path_for(output_path))
+    if HLS_AVAILABLE:
+        paths.append(hls_dir_for(output_path))
+    return paths
+
+retention = RetentionManager(RETENTION_SECONDS, STORAGE_MAX_BYTES, on_evict=forget_job)
+
+# Resumable uploads: chunks of a session are written in place into one file in UPLOAD_FOLDER;
+# retention removes sessions that got no chunk for 2 hours and counts them against the quota
+chunked_uploads = ChunkedUploadStore(UPLOAD_FOLDER, UPLOAD_MAX_BYTES, retention=retention)
+
+# GET /metrics (Prometheus text format); everything is updated as uploads and jobs progress
+app_metrics = metrics.MetricsRegistry('optifit')
+uploads_total = app_metrics.counter('uploads_total', 'Uploads received, by upload method and outcome',
+                                    ('method', 'outcome'))
+upload_bytes = app_metrics.histogram('upload_bytes', 'Size of accepted uploads in bytes', ('method',),
+                                     buckets=metrics.SIZE_BUCKETS)
+jobs_total = app_metrics.counter('jobs_total', 'Finished jobs, by exercise type and status',
+                                 ('exercise_type', 'status'))
+jobs_by_status = app_metrics.gauge('jobs', 'Jobs currently in the job store, by status', ('status',))
+queue_wait_seconds = app_metrics.histogram('job_queue_wait_seconds', 'Time jobs waited in the queue before starting',
+                                           buckets=metrics.JOB_BUCKETS)
+job_duration_seconds = app_metrics.histogram('job_duration_seconds', 'Processing time of jobs',
+                                             ('exercise_type',), buckets=metrics.JOB_BUCKETS)
+frame_inference_seconds = app_metrics.histogram('frame_inference_seconds',
+                                                'Pose inference time per frame (mean of each job, weighted by frames)',
+                                                ('exercise_type',), buckets=metrics.FRAME_BUCKETS)
+app_metrics.gauge('queue_depth', 'Jobs waiting for a worker', function=lambda: job_queue.depth())
+app_metrics.gauge('active_jobs', 'Jobs being processed', function=lambda: job_queue.running())
+app_metrics.gauge('upload_sessions', 'Open resumable upload sessions', function=lambda: chunked_uploads.active())
+app_metrics.gauge('storage_bytes', 'Bytes of uploads and processed files tracked by retention',
+                  function=lambda: retention.stats()['bytes'])
+app_metrics.counter('retention_evictions_total', 'Jobs whose files were removed, by reason', ('reason',),
+                    function=lambda: {(reason,): count for reason, count in retention.stats()['evicted'].items()})
+
+def create_job(job_id, **fields):
+    jobs[job_id] = fields
+    jobs_by_status.inc(status=fields["status"])
+
+def update_job(job_id, **fields):
+    """Update a job's fields and notify anyone waiting on it"""
+    job = jobs[job_id]
+    if "status" in fields and fields["status"] != job["status"]:
+        jobs_by_status.dec(status=job["status"])
+        jobs_by_status.inc(status=fields["status"])
+    job.update(fields)
+    job_events.notify(job_id)
+
+results_cache = result_cache.ResultCache(CACHE_FOLDER, CACHE_MAX_BYTES)
+
+def analyzer_version(exercise_type):
+    """Version of the real analyzer for an exercise, or None when only mock data is available"""
+    if exercise_type == "pushup":
+        return PUSHUP_ANALYZER_VERSION if PUSHUP_AVAILABLE else None
+    return SQUAT_ANALYZER_VERSION if SQUAT_AVAILABLE else None
+
+# Worker processes are started on first use, and only in process mode
+worker_pool = None
+worker_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """Return the warm worker pool, or None when jobs run in-process"""
+    global worker_pool
+    if EXECUTION_MODE != 'process' or not (POSE_WORKERS_AVAILABLE and SQUAT_AVAILABLE and PUSHUP_AVAILABLE):
+        return None
+    with worker_pool_lock:
+        if worker_pool is None:
+            worker_pool = PoseWorkerPool(MAX_WORKERS)
+            worker_pool.warm_up()
+    return worker_pool
+
+def run_exercise_processor(exercise_type, input_path, output_path, render=True):
+    """Run the exercise processor in-process or on the warm worker pool"""
+    pool = get_worker_pool()
+    if pool is not None:
+        return pool.run(exercise_type, input_path, output_path, render)
+    if exercise_type == "pushup":
+        return process_pushup_video(input_path, output_path, render=render)
+    return process_squat_video(input_path, output_path, render=render)
+
+# Analysis-only jobs whose annotated video is rendered on first download:
+# output filename -> {"exercise_type", "input_path", "output_path"}
+lazy_renders = {}
+lazy_render_lock = threading.Lock()
+
+def hls_url_for(video_url, output_path):
+    """URL of the HLS master playlist of a processed video, served from /processed like the MP4"""
+    hls_name = os.path.basename(hls_dir_for(output_path))
+    return f"{video_url.rsplit('/', 1)[0]}/{hls_name}/{HLS_MASTER_PLAYLIST}"
+
+def lazy_render_name(filename):
+    """Deferred MP4 whose render produces filename: the MP4 itself, or one whose HLS directory holds filename"""
+    with lazy_render_lock:
+        if filename in lazy_renders:
+            return filename
+        if not HLS_AVAILABLE or '/' not in filename:
+            return None
+        directory = filename.split('/', 1)[0]
+        for mp4_name in lazy_renders:
+            if os.path.basename(hls_dir_for(mp4_name)) == directory:
+                return mp4_name
+    return None
+
+def render_lazy_video(filename):
+    """Render a deferred video from its stored per-frame results (once, even under concurrent requests)"""
+    with lazy_render_lock:
+        pending = lazy_renders.get(filename)
+        if pending is None:
+            return
+        lock = pending.setdefault("lock", threading.Lock())
+    with lock:
+        if os.path.exists(pending["output_path"]):
+            return
+        logger.info(f"Rendering deferred {pending['exercise_type']} video: {filename}")
+        if pending["exercise_type"] == "pushup":
+            render_pushup_video(pending["input_path"], pending["output_path"])
+        else:
+            render_squat_video(pending["input_path"], pending["output_path"])
+        if pending.get("cache_key"):
+            results_cache.attach_video(pending["cache_key"], pending["output_path"])
+        owner = retention.owner(pending["output_path"])
+        if owner:
+            retention.refresh(owner)
+    with lazy_render_lock:
+        lazy_renders.pop(filename, None)
+
+def process_video_async(job_id, input_path, output_path, video_url, exercise_type="squat", render=True,
+                        cache_key=None):
     """
     IMPROVED: Enhanced error handling and fallback responses
     """
     try:
+        processor_used = False
+        started_at = time.time()
+        queued_at = jobs[job_id].get("queued_at")
+        queue_wait = round(started_at - queued_at, 3) if queued_at else None
+        if queue_wait is not None:
+            queue_wait_seconds.observe(queue_wait)
+        update_job(job_id, status="processing", started_at=int(started_at))
         logger.info(f"Starting {exercise_type} processing for job {job_id}")
         
         # Call appropriate AI processor based on exercise type
         if exercise_type.lower() == "pushup":
             if PUSHUP_AVAILABLE:
                 try:
-                    base_info = process_pushup_video(input_path, output_path)
+                    base_info = run_exercise_processor("pushup", input_path, output_path, render)
+                    processor_used = True
                     logger.info(f"Push-up processing completed for job {job_id}")
                 except Exception as e:
                     logger.error(f"Push-up processing failed, using mock data: {e}")
@@ -131,7 +363,8 @@ def process_video_async(job_id, input_path, output_path, video_url, exercise_typ
         else:  # Default to squat
             if SQUAT_AVAILABLE:
                 try:
-                    base_info = process_squat_video(input_path, output_path)
+                    base_info = run_exercise_processor("squat", input_path, output_path, render)
+                    processor_used = True
                     logger.info(f"Squat processing completed for job {job_id}")
                 except Exception as e:
                     logger.error(f"Squat processing failed, using mock data: {e}")
@@ -143,16 +376,90 @@ def process_video_async(job_id, input_path, output_path, video_url, exercise_typ
         # Add video_url and exercise_type to base_info
         base_info['video_url'] = video_url
         base_info['exercise_type'] = exercise_type
+        base_info['video_rendered'] = render
+        # HLS ladder next to the MP4 (rendered with it, or on first request when the render is deferred)
+        base_info['hls_url'] = hls_url_for(video_url, output_path) if HLS_AVAILABLE and processor_used else None
         print(f"Generated video_url for {exercise_type}:", video_url)
+
+        # Analysis-only: the video is rendered from stored results on first download
+        if not render and processor_used:
+            with lazy_render_lock:
+                lazy_renders[os.path.basename(output_path)] = {
+                    "exercise_type": exercise_type,
+                    "input_path": input_path,
+                    "output_path": output_path,
+                    "cache_key": cache_key
+                }
+
+        # Stored landmarks let /reanalyze replay the rules without pose inference
+        if processor_used and LANDMARKS_AVAILABLE:
+            jobs[job_id]["landmarks_path"] = landmarks_path_for(output_path)
+        if processor_used and TELEMETRY_AVAILABLE:
+            jobs[job_id]["telemetry_path"] = telemetry_path_for(output_path)
+
+        # Per-stage timings from the processor, plus time spent waiting in the queue
+        if processor_used and base_info.get('timings'):
+            timings = base_info['timings']
+            timings['queue_wait_s'] = queue_wait
+            timings['job_wall_s'] = round(time.time() - started_at, 3)
+            timing_stats.add(timings)
+            infer = timings['stages'].get('inference.infer')
+            if infer and infer['frames']:
+                frame_inference_seconds.observe(infer['wall_s'] / infer['frames'], count=infer['frames'],
+                                                exercise_type=exercise_type)
+
+        # Only real analyzer results are cached, never mock fallbacks
+        if processor_used and cache_key:
+            cached_result = {k: v for k, v in base_info.items()
+                             if k not in ('video_url', 'video_rendered', 'hls_url', 'timings')}
+            results_cache.put(cache_key, cached_result, output_path if render else None,
+                              files={"landmarks": jobs[job_id].get("landmarks_path"),
+                                     "telemetry": jobs[job_id].get("telemetry_path")})
         
         # Update job status
-        jobs[job_id]["status"] = "done"
-        jobs[job_id]["result"] = base_info
+        update_job(job_id, status="done", result=base_info)
+        job_duration_seconds.observe(time.time() - started_at, exercise_type=exercise_type)
+        jobs_total.inc(exercise_type=exercise_type, status="done" if processor_used else "fallback")
         
     except Exception as e:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
+        update_job(job_id, status="error", error=str(e))
+        jobs_total.inc(exercise_type=exercise_type, status="error")
         logger.error(f"Error in {exercise_type} processing for job {job_id}: {e}")
+    finally:
+        # the job's TTL starts now
+        retention.finish(job_id, job_artifacts(output_path))
+
+def notify_queue_advance(job_ids):
+    """Queued jobs moved up one position"""
+    for job_id in job_ids:
+        job_events.notify(job_id)
+
+job_queue = JobQueue(process_video_async, num_workers=MAX_WORKERS, on_advance=notify_queue_advance)
+
+# Background services start in the process that serves requests, never at import: spawned
+# pose worker processes import this module too, and must not sweep or expire files
+app_started = False
+app_start_lock = threading.Lock()
+
+def init_app():
+    """Start the job workers and the retention thread (once per serving process; no-op in worker processes)"""
+    global app_started
+    if multiprocessing.parent_process() is not None:
+        return
+    with app_start_lock:
+        if app_started:
+            return
+        app_started = True
+        job_queue.start()
+        # Files left by an earlier run are tracked (and expired) like those of finished jobs
+        retention.adopt_orphans([UPLOAD_FOLDER, PROCESSED_FOLDER])
+        retention.start()
+
+@app.before_request
+def ensure_app_started():
+    # covers `flask run` and WSGI servers; tests start services explicitly when they need them
+    if not app_started and not app.testing:
+        init_app()
 
 # Route to home
 @app.route('/', methods=['GET'])
@@ -172,8 +479,14 @@ def home():
         "available_processors": available_exercises,
         "routes": {
             "/ping": "GET - Check if the server is live",
-            "/upload": "POST - Upload a video for exercise detection (supports squat and pushup)",
-            "/result/<job_id>": "GET - Check processing status and get results"
+            "/upload": "POST - Upload a video for exercise detection (supports squat and pushup; render=false for stats only)",
+            "/uploads": "POST - Start a resumable chunked upload (PUT /uploads/<id>/chunks/<n>, GET /uploads/<id>, POST /uploads/<id>/complete)",
+            "/result/<job_id>": "GET - Check processing status and get results (?wait=<seconds> to long-poll)",
+            "/result/<job_id>/events": "GET - Server-Sent Events stream of the job's progress and completion",
+            "/reanalyze/<job_id>": "POST - Re-run rep counting over stored landmarks with optional new thresholds",
+            "/result/<job_id>/telemetry.csv": "GET - Per-frame angles, stage and form flags as CSV (.npz for the stored binary file)",
+            "/timings": "GET - Per-stage processing time aggregated over finished jobs",
+            "/metrics": "GET - Prometheus metrics (uploads, queue wait, job duration, per-frame inference time)"
         }
     }
     return jsonify(base_info), 200  
@@ -186,6 +499,127 @@ def ping():
         "supported_exercises": ["squat", "pushup"]
     }), 200
 
+def read_job_options(values):
+    """exercise_type and render option of an upload; returns (exercise_type, render, error message)"""
+    exercise_type = str(values.get('exercise_type', 'squat')).lower()
+    if exercise_type not in ['squat', 'pushup']:
+        return None, None, f"Invalid exercise type '{exercise_type}'. Supported types: squat, pushup"
+
+    # render=false (or lazy) returns stats only; the video is rendered on first download
+    render_mode = str(values.get('render', 'true')).lower()
+    if render_mode not in ['true', 'false', 'lazy']:
+        return None, None, f"Invalid render option '{render_mode}'. Supported values: true, false, lazy"
+    return exercise_type, render_mode == 'true', None
+
+def queue_upload(exercise_type, render, original_filename, place_upload, method="multipart"):
+    """
+    Create a job for a received upload: answer from the result cache when the same
+    bytes were already analyzed, otherwise queue it. place_upload(input_path) moves
+    the upload into place and returns its sha256 hex digest.
+    """
+    filename = secure_filename(original_filename)
+    timestamp = int(time.time())
+    input_filename = f"{exercise_type}_{timestamp}_{filename}"
+    # every upload format is encoded to H.264 MP4; landmarks, telemetry and HLS are named after its stem
+    output_filename = f"processed_{exercise_type}_{timestamp}_{os.path.splitext(filename)[0]}.mp4"
+    
+    input_path = os.path.join(UPLOAD_FOLDER, input_filename)
+    output_path = os.path.join(PROCESSED_FOLDER, output_filename)
+    
+    # Move the received upload into place (it was hashed while it was received)
+    content_hash = place_upload(input_path)
+    upload_bytes.observe(os.path.getsize(input_path), method=method)
+    
+    # Generate video URL
+    video_url = url_for('get_processed_video', filename=output_filename, _external=True)
+    
+    # Create job
+    job_id = str(uuid.uuid4())
+
+    # Identical bytes already analyzed by this analyzer version: answer from the cache
+    version = analyzer_version(exercise_type)
+    cache_key = result_cache.make_key(content_hash, exercise_type, version) if version else None
+    cached = results_cache.get(cache_key, need_video=render) if cache_key else None
+    if cached is not None:
+        job_files = {}
+        # the job gets the cached landmarks and telemetry, so /reanalyze and telemetry export work for it
+        cached_landmarks = results_cache.file_path(cached, "landmarks")
+        if cached_landmarks and LANDMARKS_AVAILABLE:
+            job_files["landmarks_path"] = landmarks_path_for(output_path)
+            result_cache.link_or_copy(cached_landmarks, job_files["landmarks_path"])
+        cached_telemetry = results_cache.file_path(cached, "telemetry")
+        if cached_telemetry and TELEMETRY_AVAILABLE:
+            job_files["telemetry_path"] = telemetry_path_for(output_path)
+            result_cache.link_or_copy(cached_telemetry, job_files["telemetry_path"])
+
+        cached_video = results_cache.video_path(cached)
+        # Analysis-only hit without a cached video: render it from the cached landmarks on first request
+        lazy = cached_video is None and "landmarks_path" in job_files
+        if cached_video:
+            result_cache.link_or_copy(cached_video, output_path)
+        elif lazy:
+            with lazy_render_lock:
+                lazy_renders[output_filename] = {
+                    "exercise_type": exercise_type,
+                    "input_path": input_path,
+                    "output_path": output_path,
+                    "cache_key": cache_key
+                }
+        if not lazy:
+            os.remove(input_path)
+        result = dict(cached['result'])
+        result['video_url'] = video_url if cached_video or lazy else None
+        result['video_rendered'] = cached_video is not None
+        result['hls_url'] = hls_url_for(video_url, output_path) if lazy and HLS_AVAILABLE else None
+        result['exercise_type'] = exercise_type
+        result['cached'] = True
+        create_job(job_id,
+                   status="done",
+                   exercise_type=exercise_type,
+                   render=render,
+                   created_at=timestamp,
+                   output_path=output_path,
+                   result=result,
+                   **job_files)
+        retention.finish(job_id, ([input_path] if lazy else []) + job_artifacts(output_path))
+        uploads_total.inc(method=method, outcome="cached")
+        logger.info(f"Cache hit for {exercise_type} upload, job {job_id}")
+        return jsonify({
+            "status": "done",
+            "job_id": job_id,
+            "exercise_type": exercise_type,
+            "message": f"{exercise_type.capitalize()} video was already analyzed. Returning cached result.",
+            "video_url": result['video_url'],
+            "video_rendered": result['video_rendered'],
+            "cached": True,
+            "result": result
+        })
+    create_job(job_id,
+               status="queued",
+               exercise_type=exercise_type,
+               render=render,
+               created_at=timestamp,
+               output_path=output_path,
+               queued_at=time.time())
+    retention.track(job_id, [input_path])
+    uploads_total.inc(method=method, outcome="queued")
+    
+    # Queue for background processing
+    queue_position = job_queue.submit(job_id, input_path, output_path, video_url, exercise_type, render, cache_key)
+    
+    response_data = {
+        "status": "queued",
+        "job_id": job_id,
+        "exercise_type": exercise_type,
+        "message": f"{exercise_type.capitalize()} video uploaded successfully. Processing queued.",
+        "video_url": video_url,
+        "video_rendered": render,
+        "queue_position": queue_position
+    }
+    
+    logger.info(f"Queued {exercise_type} processing job: {job_id} (position {queue_position})")
+    return jsonify(response_data)
+
 # Route to upload the video
 @app.route('/upload', methods=['POST'])
 def upload_video():
@@ -196,66 +630,166 @@ def upload_video():
         # Use custom validation if validation.py not available
         if VALIDATION_AVAILABLE:
             video = validate_upload_request(request)
-            validate_video_file(video)
+            validate_video_file(video, upload_size(video))
         else:
             video = validate_upload_request(request)
-            validate_video_file(video)
-        
-        # Get exercise type from form data
-        exercise_type = request.form.get('exercise_type', 'squat').lower()
-        
-        # Validate exercise type
-        if exercise_type not in ['squat', 'pushup']:
-            return error_response(f"Invalid exercise type '{exercise_type}'. Supported types: squat, pushup", 400)
-        
-        filename = secure_filename(video.filename)
-        timestamp = int(time.time())
-        input_filename = f"{exercise_type}_{timestamp}_{filename}"
-        output_filename = f"processed_{exercise_type}_{timestamp}_{filename}"
-        
-        input_path = os.path.join(UPLOAD_FOLDER, input_filename)
-        output_path = os.path.join(PROCESSED_FOLDER, output_filename)
+            validate_video_file(video, upload_size(video))
         
-        # Save uploaded video
-        video.save(input_path)
-        
-        # Generate video URL
-        video_url = url_for('get_processed_video', filename=output_filename, _external=True)
-        
-        # Create job
-        job_id = str(uuid.uuid4())
-        jobs[job_id] = {
-            "status": "processing",
-            "exercise_type": exercise_type,
-            "created_at": timestamp
-        }
-        
-        # Start background processing
-        threading.Thread(
-            target=process_video_async, 
-            args=(job_id, input_path, output_path, video_url, exercise_type)
-        ).start()
-        
-        response_data = {
-            "status": "processing",
-            "job_id": job_id,
-            "exercise_type": exercise_type,
-            "message": f"{exercise_type.capitalize()} video uploaded successfully. Processing started.",
-            "video_url": video_url
-        }
+        # Get exercise type and render option from form data
+        exercise_type, render, error = read_job_options(request.form)
+        if error:
+            return error_response(error, 400)
         
-        logger.info(f"Started {exercise_type} processing job: {job_id}")
-        return jsonify(response_data)
+        return queue_upload(exercise_type, render, video.filename,
+                            lambda input_path: commit_upload(video, input_path))
     
+    except RequestEntityTooLarge as e:
+        uploads_total.inc(method="multipart", outcome="rejected")
+        logger.error(f"Upload rejected: {e.description}")
+        return error_response(e.description, 413)
     except Exception as e:
+        uploads_total.inc(method="multipart", outcome="rejected")
         logger.error(f"Upload error: {str(e)}")
         return error_response(str(e), 500)
 
+# Resumable chunked uploads: create a session, PUT numbered chunks, check progress, then complete
+@app.route('/uploads', methods=['POST'])
+def create_chunked_upload():
+    """
+    Start a resumable upload:
+    {"filename": "set.mp4", "total_size": 104857600, "exercise_type": "squat", "render": "true", "chunk_size": 4194304}
+    """
+    try:
+        data = request.get_json(silent=True) or request.form
+        filename = data.get('filename')
+        if not filename:
+            return error_response("'filename' is required", 400)
+        try:
+            total_size = int(data.get('total_size', 0))
+            chunk_size = int(data.get('chunk_size', DEFAULT_CHUNK_SIZE))
+        except (TypeError, ValueError):
+            return error_response("'total_size' and 'chunk_size' must be integers", 400)
+        try:
+            validate_video_file(FileStorage(filename=filename), total_size)
+        except Exception as e:
+            return error_response(getattr(e, 'message', str(e)), getattr(e, 'status_code', 400))
+
+        exercise_type, render, error = read_job_options(data)
+        if error:
+            return error_response(error, 400)
+
+        session = chunked_uploads.create(filename, total_size, chunk_size,
+                                         exercise_type=exercise_type, render=render)
+        logger.info(f"Created upload session {session['upload_id']} ({session['total_chunks']} chunks)")
+        return jsonify(session), 201
+
+    except UploadSessionError as e:
+        return error_response(e.message, e.status_code)
+    except Exception as e:
+        logger.error(f"Error creating upload session: {str(e)}")
+        return error_response(str(e), 500)
+
+@app.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def put_upload_chunk(upload_id, index):
+    """Write one chunk (raw request body) at its offset; ?offset= is checked when given"""
+    try:
+        offset = request.args.get('offset', type=int)
+        return jsonify(chunked_uploads.write_chunk(upload_id, index, request.stream, offset))
+    except UploadSessionError as e:
+        return error_response(e.message, e.status_code)
+    except Exception as e:
+        logger.error(f"Error writing chunk {index} of upload {upload_id}: {str(e)}")
+        return error_response(str(e), 500)
+
+@app.route('/uploads/<upload_id>', methods=['GET', 'DELETE'])
+def chunked_upload_status(upload_id):
+    """Which chunks of an upload are present (GET), or abandon the upload (DELETE)"""
+    try:
+        if request.method == 'DELETE':
+            chunked_uploads.discard(upload_id)
+            return jsonify({"upload_id": upload_id, "status": "deleted"})
+        return jsonify(chunked_uploads.status(upload_id))
+    except UploadSessionError as e:
+        return error_response(e.message, e.status_code)
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_chunked_upload(upload_id):
+    """
+    Turn a complete upload into a job; responds like /upload. Completing it again
+    (a retry, or a concurrent request) returns the job's current state instead.
+    """
+    try:
+        with chunked_uploads.completion(upload_id) as completion:
+            if completion["job_id"] is not None:
+                payload, status_code = job_status_payload(completion["job_id"])
+                return jsonify(dict(payload, job_id=completion["job_id"], already_completed=True)), status_code
+
+            session = chunked_uploads.status(upload_id)
+            if not session["complete"]:
+                return error_response(f"Upload is missing {len(session['missing_chunks'])} chunk(s)", 409)
+            response = queue_upload(session["exercise_type"], session["render"], session["filename"],
+                                    lambda input_path: chunked_uploads.finalize(upload_id, input_path),
+                                    method="chunked")
+            completion["job_id"] = response.get_json()["job_id"]
+            return response
+    except UploadSessionError as e:
+        return error_response(e.message, e.status_code)
+    except Exception as e:
+        logger.error(f"Error completing upload {upload_id}: {str(e)}")
+        return error_response(str(e), 500)
+
+def job_status_payload(job_id):
+    """/result body and status code for a job's current state"""
+    job = jobs.get(job_id)
+    if job is None:
+        # removed by retention since the caller looked it up
+        return {"status": "not_found", "message": "Job not found"}, 404
+    exercise_type = job.get("exercise_type", "unknown")
+    version = job_events.version(job_id)
+    
+    if job["status"] == "queued":
+        return {
+            "status": "queued",
+            "exercise_type": exercise_type,
+            "queue_position": job_queue.position(job_id),
+            "version": version,
+            "message": f"{exercise_type.capitalize()} video is waiting to be processed..."
+        }, 200
+    elif job["status"] == "processing":
+        return {
+            "status": "processing", 
+            "exercise_type": exercise_type,
+            "queue_position": 0,
+            "version": version,
+            "message": f"{exercise_type.capitalize()} video is being processed..."
+        }, 200
+    elif job["status"] == "error":
+        return {
+            "status": "error",
+            "exercise_type": exercise_type,
+            "version": version,
+            "error": job.get("error", "Unknown error occurred")
+        }, 500
+    else:
+        return {
+            "status": "done", 
+            "exercise_type": exercise_type,
+            "version": version,
+            "result": job["result"]
+        }, 200
+
+def job_finished(job_id):
+    job = jobs.get(job_id)
+    return job is None or job["status"] in ("done", "error")
+
 # Route to get the result of the job
 @app.route('/result/<job_id>', methods=['GET'])
 def get_result(job_id):
     """
-    Get processing results
+    Get processing results.
+    ?wait=<seconds> long-polls: the request returns as soon as the job changes
+    (or the timeout passes). Pass the last seen ?since=<version> to avoid
+    missing a change between two polls.
     """
     try:
         if VALIDATION_AVAILABLE:
@@ -263,32 +797,123 @@ def get_result(job_id):
         else:
             validate_job_request(job_id, jobs)
 
-        job = jobs.get(job_id)
-        exercise_type = job.get("exercise_type", "unknown")
-        
-        if job["status"] == "processing":
-            return jsonify({
-                "status": "processing", 
-                "exercise_type": exercise_type,
-                "message": f"{exercise_type.capitalize()} video is being processed..."
-            })
-        elif job["status"] == "error":
-            return jsonify({
-                "status": "error",
-                "exercise_type": exercise_type,
-                "error": job.get("error", "Unknown error occurred")
-            }), 500
-        else:
-            return jsonify({
-                "status": "done", 
-                "exercise_type": exercise_type,
-                "result": job["result"]
-            })
+        wait = min(request.args.get('wait', 0, type=float), LONG_POLL_MAX_SECONDS)
+        if wait > 0 and not job_finished(job_id):
+            since = request.args.get('since', job_events.version(job_id), type=int)
+            job_events.wait(job_id, since, wait)
+            if job_id not in jobs:
+                return error_response("Job not found", 404)
+
+        retention.touch(job_id)
+        payload, status_code = job_status_payload(job_id)
+        return jsonify(payload), status_code
         
     except Exception as e:
         logger.error(f"Error getting result: {str(e)}")
         return error_response(str(e), 404 if "not found" in str(e).lower() else 500)
 
+# Server-Sent Events stream of a job's state changes
+@app.route('/result/<job_id>/events', methods=['GET'])
+def stream_result_events(job_id):
+    """
+    Push the job's state as SSE "status" events (queue position, processing)
+    until a final "done" or "error" event, then close the stream.
+    """
+    try:
+        validate_job_request(job_id, jobs)
+    except Exception as e:
+        return error_response(str(e), 404 if "not found" in str(e).lower() else 400)
+
+    def events():
+        version = None
+        while True:
+            if job_id not in jobs:
+                yield "event: error\ndata: " + json.dumps({"status": "not_found"}) + "\n\n"
+                return
+            current = job_events.version(job_id)
+            if current != version:
+                version = current
+                payload, _ = job_status_payload(job_id)
+                finished = payload["status"] in ("done", "error")
+                event = payload["status"] if finished else "status"
+                yield f"id: {version}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+                if finished:
+                    return
+            if job_events.wait(job_id, version, EVENT_STREAM_HEARTBEAT_SECONDS) == version:
+                yield ": keep-alive\n\n"
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Route to re-run rep counting and form rules over a job's stored landmarks
+@app.route('/reanalyze/<job_id>', methods=['POST'])
+def reanalyze_job(job_id):
+    """
+    Replay the rep state machine over stored landmarks, optionally with new thresholds:
+    {"thresholds": {"DEPTH_THRESHOLD": 95}}
+    """
+    try:
+        validate_job_request(job_id, jobs)
+
+        job = jobs[job_id]
+        exercise_type = job.get("exercise_type", "squat")
+        landmarks_path = job.get("landmarks_path")
+        if not landmarks_path or not os.path.exists(landmarks_path):
+            return error_response("No stored landmarks for this job", 404)
+
+        data = request.get_json(silent=True) or {}
+        thresholds = data.get("thresholds", {})
+        defaults = PUSHUP_THRESHOLDS if exercise_type == "pushup" else SQUAT_THRESHOLDS
+        if not isinstance(thresholds, dict):
+            return error_response("'thresholds' must be an object", 400)
+        unknown = sorted(set(thresholds) - set(defaults))
+        if unknown:
+            return error_response(f"Unknown thresholds: {', '.join(unknown)}. Supported: {', '.join(defaults)}", 400)
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in thresholds.values()):
+            return error_response("Threshold values must be numbers", 400)
+
+        start = time.perf_counter()
+        if exercise_type == "pushup":
+            result = analyze_pushup_landmarks(landmarks_path, thresholds)
+        else:
+            result = analyze_squat_landmarks(landmarks_path, thresholds)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        return jsonify({
+            "status": "done",
+            "job_id": job_id,
+            "exercise_type": exercise_type,
+            "thresholds": dict(defaults, **thresholds),
+            "result": result,
+            "analysis_ms": round(elapsed_ms, 2)
+        })
+
+    except Exception as e:
+        logger.error(f"Error re-analyzing job {job_id}: {str(e)}")
+        return error_response(str(e), 404 if "not found" in str(e).lower() else 500)
+
+@app.route('/result/<job_id>/telemetry.<fmt>', methods=['GET'])
+def get_telemetry(job_id, fmt):
+    """Per-frame analysis telemetry of a job: .csv is rendered on request, .npz is the stored file"""
+    try:
+        validate_job_request(job_id, jobs)
+
+        telemetry_path = jobs[job_id].get("telemetry_path")
+        if not telemetry_path or not os.path.exists(telemetry_path):
+            return error_response("No telemetry for this job", 404)
+        if fmt == "npz":
+            return send_file(os.path.abspath(telemetry_path), as_attachment=True, mimetype='application/octet-stream')
+        if fmt != "csv":
+            return error_response(f"Unsupported telemetry format '{fmt}'. Supported: csv, npz", 400)
+
+        filename = os.path.basename(telemetry_path).replace('.npz', '.csv')
+        return Response(iter_csv(telemetry_path), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+    except Exception as e:
+        logger.error(f"Error exporting telemetry of job {job_id}: {str(e)}")
+        return error_response(str(e), 404 if "not found" in str(e).lower() else 500)
+
 # Health check endpoint
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -302,84 +927,122 @@ def health_check():
             'pushup': PUSHUP_AVAILABLE,
             'validation': VALIDATION_AVAILABLE
         },
-        'active_jobs': len([j for j in jobs.values() if j.get("status") == "processing"]),
+        'active_jobs': job_queue.running(),
+        'queue_depth': job_queue.depth(),
+        'max_workers': job_queue.num_workers,
+        'execution_mode': EXECUTION_MODE,
+        'worker_pool_started': worker_pool is not None,
         'total_jobs': len(jobs),
+        'result_cache': results_cache.stats(),
+        'upload_sessions': chunked_uploads.active(),
+        'storage': retention.stats(),
         'timestamp': int(time.time())
     })
 
+# Aggregated per-stage timings
+@app.route('/timings', methods=['GET'])
+def get_timings():
+    """Per-stage wall/CPU time and throughput summed over every analyzed job"""
+    return jsonify(timing_stats.snapshot())
+
+# Prometheus scrape endpoint
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Upload, queue and job counters and latency histograms in Prometheus text format"""
+    return Response(app_metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # Jobs listing endpoint
 @app.route('/jobs', methods=['GET'])
 def list_jobs():
     """List all jobs"""
+    queue_positions = job_queue.positions()
     job_summary = {}
     for job_id, job_data in jobs.items():
         job_summary[job_id] = {
             'status': job_data.get('status'),
             'exercise_type': job_data.get('exercise_type'),
-            'created_at': job_data.get('created_at')
+            'created_at': job_data.get('created_at'),
+            'queue_position': queue_positions.get(job_id, 0 if job_data.get('status') == 'processing' else None)
         }
     
     return jsonify({
-        'active_jobs': len([j for j in jobs.values() if j.get("status") == "processing"]),
-        'completed_jobs': len([j for j in jobs.values() if j.get("status") == "done"]),
-        'failed_jobs': len([j for j in jobs.values() if j.get("status") == "error"]),
+        'queued_jobs': len(queue_positions),
+        'active_jobs': jobs_by_status.value(status="processing"),
+        'completed_jobs': jobs_by_status.value(status="done"),
+        'failed_jobs': jobs_by_status.value(status="error"),
         'jobs': job_summary
     })
 
 # Serve processed videos
-@app.route('/processed/<filename>')
+# Content types of the files served from /processed
+PROCESSED_MIMETYPES = {
+    '.mp4': 'video/mp4',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t'
+}
+
+@app.route('/processed/<path:filename>')
 def get_processed_video(filename):
-    """Serve processed video files"""
+    """
+    Serve processed video files inline for streaming playback: Range requests get
+    206 partial content, and If-None-Match / If-Modified-Since get 304 when the
+    file is unchanged. ?download=1 sends it as an attachment instead.
+    HLS playlists and segments (<name>_hls/...) are served the same way.
+    """
     try:
-        file_path = os.path.join(PROCESSED_FOLDER, filename)
+        mimetype = PROCESSED_MIMETYPES.get(os.path.splitext(filename)[1].lower())
+        # hidden names are outputs still being encoded (see video_encoder.partial_path)
+        if mimetype is None or any(part.startswith('.') for part in filename.split('/')):
+            return error_response("Video file not found", 404)
+        file_path = safe_join(PROCESSED_FOLDER, filename)
+        if file_path is None:
+            return error_response("Video file not found", 404)
+        # send_file resolves relative paths against the app root, not the working directory
+        file_path = os.path.abspath(file_path)
+        if not os.path.exists(file_path):
+            lazy_name = lazy_render_name(filename)
+            if lazy_name:
+                render_lazy_video(lazy_name)
         if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True, mimetype='video/mp4')
+            owner = retention.owner(file_path)
+            if owner:
+                retention.touch(owner)
+            download = request.args.get('download', '').lower() in ('1', 'true', 'yes')
+            # ETag and Last-Modified come from the file's mtime and size; processed files never change
+            # once written, so clients may keep them for PROCESSED_MAX_AGE seconds without revalidating
+            return send_file(file_path, mimetype=mimetype, as_attachment=download, conditional=True,
+                             etag=True, max_age=PROCESSED_MAX_AGE)
         else:
             return error_response("Video file not found", 404)
     except Exception as e:
         logger.error(f"Error serving video {filename}: {str(e)}")
         return error_response("Error serving video file", 500)
 
-# Cleanup function
-def cleanup_old_files():
-    """Clean up old video files periodically"""
-    while True:
-        try:
-            current_time = time.time()
-            for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER]:
-                if os.path.exists(folder):
-                    for filename in os.listdir(folder):
-                        file_path = os.path.join(folder, filename)
-                        try:
-                            file_time = os.path.getctime(file_path)
-                            if current_time - file_time > 7200:  # 2 hours
-                                os.remove(file_path)
-                                logger.info(f"Cleaned up old file: {filename}")
-                        except:
-                            pass
-        except Exception as e:
-            logger.error(f"Cleanup error: {e}")
-        time.sleep(3600)  # Run every hour
-
 if __name__ == '__main__':
-    # Start cleanup thread
-    cleanup_thread = threading.Thread(target=cleanup_old_files)
-    cleanup_thread.daemon = True
-    cleanup_thread.start()
-    
     print("🚀 Exercise Detection Server Starting...")
     print("💪 Supported exercises: squat, pushup")
     print("📊 Module status:")
     print(f"   Squat processor: {'✅ Available' if SQUAT_AVAILABLE else '❌ Mock data'}")
     print(f"   Push-up processor: {'✅ Available' if PUSHUP_AVAILABLE else '❌ Mock data'}")
     print(f"   Validation: {'✅ Available' if VALIDATION_AVAILABLE else '❌ Basic validation'}")
+    print(f"   Workers: {MAX_WORKERS} ({EXECUTION_MODE} mode)")
     print("📊 Endpoints:")
     print("   GET  / - Server info")
     print("   GET  /ping - Health check")
     print("   GET  /health - Detailed health status")
     print("   POST /upload - Upload exercise video")
+    print("   POST /uploads - Start a resumable chunked upload")
     print("   GET  /result/<job_id> - Get analysis results")
+    print("   GET  /result/<job_id>/events - Stream job progress (SSE)")
+    print("   POST /reanalyze/<job_id> - Re-analyze stored landmarks")
+    print("   GET  /result/<job_id>/telemetry.csv - Export per-frame telemetry")
     print("   GET  /jobs - List all jobs")
+    print("   GET  /timings - Aggregated per-stage timings")
+    print("   GET  /metrics - Prometheus metrics")
     
-    # Start Flask app
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Start Flask app; with the debug reloader this file runs twice, and only the
+    # reloader's child process serves requests
+    debug = True
+    if not debug or is_running_from_reloader():
+        init_app()
+    app.run(host="0.0.0.0", port=5000, debug=debug)
@@ -0,0 +1,313 @@
+"""benchmark.py - Throughput benchmarks on resampled exercise recordings
+
+Builds each clip from a real recording of the exercise (the sample videos
+in uploads/), letterboxed to the case's resolution and resampled to its
+length and frame rate, then runs process_squat_video, process_pushup_video
+and pose_server's /analyze_frame against it. Every case reports how many
+frames had a detected pose and the reps counted, and fails when no pose
+was detected, so the timings always cover the full landmark, analysis and
+drawing path. Each case runs in a fresh subprocess so its peak RSS is its
+own. Results are written as JSON that can be compared across commits:
+
+    python benchmark.py --out bench.json
+    python benchmark.py --out new.json --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# (width, height), seconds, fps
+QUICK_MATRIX = [((640, 360), 5, 30), ((1280, 720), 5, 30)]
+FULL_MATRIX = [(size, seconds, fps)
+               for size in [(640, 360), (1280, 720), (1920, 1080)]
+               for seconds in [5, 20]
+               for fps in [15, 30]]
+TARGETS = ["squat", "pushup", "analyze_frame"]
+# Relative slowdown reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+# Real recordings the clips are built from (MediaPipe must detect the person in them)
+SAMPLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
+SAMPLE_VIDEOS = {
+    "squat": os.environ.get("BENCHMARK_SQUAT_VIDEO", os.path.join(SAMPLE_DIR, "squat_video.mp4")),
+    "pushup": os.environ.get("BENCHMARK_PUSHUP_VIDEO", os.path.join(SAMPLE_DIR, "pushup_video.mp4")),
+}
+
+
+def _letterbox(frame, width, height):
+    """Fit frame into width x height without distorting the person, padding with black."""
+    import cv2
+    import numpy as np
+
+    source_height, source_width = frame.shape[:2]
+    scale = min(width / source_width, height / source_height)
+    fitted_width, fitted_height = max(1, round(source_width * scale)), max(1, round(source_height * scale))
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    top, left = (height - fitted_height) // 2, (width - fitted_width) // 2
+    canvas[top:top + fitted_height, left:left + fitted_width] = cv2.resize(
+        frame, (fitted_width, fitted_height), interpolation=cv2.INTER_AREA)
+    return canvas
+
+
+def generate_clip(path, exercise, size, seconds, fps):
+    """
+    Write a clip of the exercise's sample recording as H.264: letterboxed to size and
+    resampled to fps, looping the recording until the clip is `seconds` long. A portrait
+    recording gives a portrait clip (size with width and height swapped). Landmarks are
+    normalized to the frame's sides, so a different aspect ratio would change the joint
+    angles and the reps counted.
+    """
+    import cv2
+    from video_encoder import FFmpegWriter
+
+    sample_path = SAMPLE_VIDEOS[exercise]
+    cap = cv2.VideoCapture(sample_path)
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    source_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    if not cap.isOpened() or source_frames <= 0:
+        cap.release()
+        raise RuntimeError(f"Sample video not found or unreadable: {sample_path}")
+
+    width, height = size
+    portrait = cap.get(cv2.CAP_PROP_FRAME_HEIGHT) > cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+    if portrait != (height > width):
+        width, height = height, width
+    writer = FFmpegWriter(path, fps, (width, height))
+    try:
+        position, frame = 0, None  # index of the next source frame cap.read() returns
+        for index in range(int(seconds * fps)):
+            target = int(index / fps * source_fps) % source_frames
+            if target < position - 1:
+                # looped around: start the recording again
+                cap.release()
+                cap = cv2.VideoCapture(sample_path)
+                position = 0
+            while position <= target:
+                ok, decoded = cap.read()
+                if not ok:
+                    break
+                frame = decoded
+                position += 1
+            writer.write(_letterbox(frame, width, height))
+    finally:
+        cap.release()
+        writer.release()
+    return path
+
+
+def _detected_frames(output_path):
+    """Frames of a processed job with a detected pose, from its stored landmarks."""
+    import numpy as np
+    from landmark_store import landmarks_path_for, load_landmarks
+
+    landmarks = load_landmarks(landmarks_path_for(output_path))["landmarks"]
+    return int(np.count_nonzero(~np.isnan(landmarks[:, 0, 0])))
+
+
+def _latency_summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_video_case(target, clip_path, work_dir, repeat):
+    """Time whole jobs of process_squat_video / process_pushup_video on one clip."""
+    if target == "pushup":
+        from pushup_counter import process_pushup_video as process_video
+    else:
+        from squat_counter import process_squat_video as process_video
+    from pose_utils import create_pose
+
+    pose = create_pose()  # warm graph, as the worker pool would hold
+    latencies = []
+    frames = 0
+    try:
+        for run in range(repeat):
+            output_path = os.path.join(work_dir, f"out_{target}_{run}.mp4")
+            start = time.perf_counter()
+            result = process_video(clip_path, output_path, log_telemetry=False, pose=pose)
+            latencies.append(time.perf_counter() - start)
+        import cv2
+        cap = cv2.VideoCapture(clip_path)
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+    finally:
+        pose.close()
+    return {
+        "frames": frames,
+        "detected_frames": _detected_frames(output_path),
+        "reps": result[f"{target}_count"],
+        "runs": repeat,
+        "job_latency": _latency_summary(latencies),
+        "frames_per_sec": round(frames * repeat / sum(latencies), 2),
+    }
+
+
+def run_analyze_frame_case(clip_path, repeat):
+    """Send every frame of the clip to pose_server's /analyze_frame (in-process test client, binary body)."""
+    import cv2
+    import pose_server
+
+    cap = cv2.VideoCapture(clip_path)
+    encoded = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        encoded.append(cv2.imencode(".jpg", frame)[1].tobytes())
+    cap.release()
+
+    client = pose_server.app.test_client()
+    latencies = []
+    for run in range(repeat):
+        session_id = f"bench-{run}"
+        detected, reps = 0, 0  # of the last run
+        for index, body in enumerate(encoded):
+            start = time.perf_counter()
+            response = client.post(f"/analyze_frame?session_id={session_id}&timestamp={index}", data=body,
+                                   content_type="image/jpeg")
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"/analyze_frame returned {response.status_code}")
+            data = response.get_json()
+            if data.get("pose_detected"):
+                detected += 1
+                reps = data["analysis"]["squat_count"]
+    return {
+        "frames": len(encoded),
+        "detected_frames": detected,
+        "reps": reps,
+        "runs": repeat,
+        "frame_latency": _latency_summary(latencies),
+        "frames_per_sec": round(len(latencies) / sum(latencies), 2),
+    }
+
+
+def run_case(case):
+    """Entry point of a case subprocess: generate the clip, run the target, report JSON."""
+    width, height = case["size"]
+    exercise = "pushup" if case["target"] == "pushup" else "squat"
+    with tempfile.TemporaryDirectory() as work_dir:
+        clip_path = os.path.join(work_dir, f"clip_{exercise}_{width}x{height}_{case['seconds']}s_{case['fps']}fps.mp4")
+        generate_clip(clip_path, exercise, (width, height), case["seconds"], case["fps"])
+        if case["target"] == "analyze_frame":
+            result = run_analyze_frame_case(clip_path, case["repeat"])
+        else:
+            result = run_video_case(case["target"], clip_path, work_dir, case["repeat"])
+    if result["detected_frames"] == 0:
+        # only the no-pose path was timed; the numbers say nothing about real jobs
+        raise RuntimeError(f"No pose detected in any of the {result['frames']} frames")
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def case_name(case):
+    width, height = case["size"]
+    return f"{case['target']}/{width}x{height}/{case['seconds']}s/{case['fps']}fps"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(matrix, targets, repeat):
+    results = []
+    for target in targets:
+        for size, seconds, fps in matrix:
+            case = {"target": target, "size": list(size), "seconds": seconds, "fps": fps, "repeat": repeat}
+            name = case_name(case)
+            print(f"⏱️  {name}", file=sys.stderr)
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(case)],
+                                  capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+            entry = {"name": name, **case}
+            if proc.returncode != 0:
+                entry["error"] = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"
+                print(f"❌ {name}: {entry['error']}", file=sys.stderr)
+            else:
+                entry.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+            results.append(entry)
+    return results
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Cases whose frames/sec dropped by more than threshold against a baseline report."""
+    baseline_fps = {entry["name"]: entry.get("frames_per_sec") for entry in baseline.get("results", [])}
+    regressions = []
+    for entry in results:
+        old, new = baseline_fps.get(entry["name"]), entry.get("frames_per_sec")
+        if old and new and new < old * (1 - threshold):
+            regressions.append({"name": entry["name"], "baseline_fps": old, "fps": new,
+                                "change": round(new / old - 1, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--full", action="store_true", help="run the full resolution/length/fps matrix")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"comma-separated subset of {TARGETS}")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case")
+    parser.add_argument("--compare", help="baseline report; exit 1 if frames/sec regressed")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return 0
+
+    targets = [target for target in args.targets.split(",") if target in TARGETS]
+    report = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "machine": {"platform": platform.platform(), "python": platform.python_version(),
+                    "cpu_count": os.cpu_count()},
+        "config": {key: os.environ[key] for key in ["INFERENCE_MAX_SIDE", "OUTPUT_MAX_SIDE", "PIPELINE_QUEUE_SIZE",
+                                                    "SEGMENT_WORKERS", "SEGMENT_MIN_SECONDS"] if key in os.environ},
+        "results": run_suite(FULL_MATRIX if args.full else QUICK_MATRIX, targets, args.repeat),
+    }
+
+    # failed cases (including clips where no pose was detected) fail the run
+    exit_code = 1 if any("error" in entry for entry in report["results"]) else 0
+    if args.compare:
+        with open(args.compare) as f:
+            report["regressions"] = compare(report["results"], json.load(f))
+        for regression in report["regressions"]:
+            print(f"📉 {regression['name']}: {regression['baseline_fps']} -> {regression['fps']} fps "
+                  f"({regression['change']:+.1%})", file=sys.stderr)
+        if report["regressions"]:
+            exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
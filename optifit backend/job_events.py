@@ -0,0 +1,48 @@
+"""job_events.py - Job state change notifications
+
+Every change to a job (queued position, processing, done, error) bumps
+the job's version and wakes only the requests waiting on that job, so
+long-poll and Server-Sent Events clients are pushed updates instead of
+polling /result in a loop.
+"""
+
+import threading
+
+
+class JobEvents:
+    """Per-job version counters with an Event per job that waiters block on."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._events = {}
+
+    def version(self, job_id):
+        with self._lock:
+            return self._versions.get(job_id, 0)
+
+    def notify(self, job_id):
+        """Record a change to job_id and wake everyone waiting on it."""
+        with self._lock:
+            self._versions[job_id] = self._versions.get(job_id, 0) + 1
+            event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    def wait(self, job_id, since_version, timeout):
+        """Block until job_id's version differs from since_version or timeout passes; returns the current version."""
+        with self._lock:
+            version = self._versions.get(job_id, 0)
+            if version != since_version:
+                return version
+            event = self._events.setdefault(job_id, threading.Event())
+        event.wait(timeout)
+        return self.version(job_id)
+
+    def forget(self, job_id):
+        """Drop a job's counters (and wake its waiters) once the job itself is gone."""
+        with self._lock:
+            self._versions.pop(job_id, None)
+            event = self._events.pop(job_id, None)
+        if event is not None:
+            event.set()
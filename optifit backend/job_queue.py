@@ -0,0 +1,97 @@
+"""job_queue.py - Bounded worker pool for video processing jobs
+
+Jobs are appended to a FIFO queue and picked up by a fixed number of
+worker threads, so a burst of uploads waits its turn instead of starting
+one MediaPipe graph + ffmpeg encode per request.
+"""
+
+import collections
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """FIFO job queue drained by a fixed pool of worker threads."""
+
+    def __init__(self, handler, num_workers=2, on_advance=None):
+        """
+        handler: callable invoked as handler(job_id, *args) by a worker
+        num_workers: number of jobs allowed to run at the same time
+        on_advance: optional callable invoked with the ids of the jobs still
+                    waiting whenever one leaves the queue (their positions changed)
+        """
+        self.handler = handler
+        self.num_workers = max(1, int(num_workers))
+        self.on_advance = on_advance
+        self._pending = collections.deque()  # (job_id, args) in arrival order
+        self._running = set()
+        self._cond = threading.Condition()
+        self._workers = []
+
+    def start(self):
+        """Start the worker threads (idempotent)."""
+        with self._cond:
+            if self._workers:
+                return
+            for i in range(self.num_workers):
+                worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}")
+                worker.daemon = True
+                worker.start()
+                self._workers.append(worker)
+        logger.info(f"Job queue started with {self.num_workers} workers")
+
+    def submit(self, job_id, *args):
+        """Append a job to the queue and return its 1-based queue position."""
+        with self._cond:
+            self._pending.append((job_id, args))
+            position = len(self._pending)
+            self._cond.notify()
+        return position
+
+    def position(self, job_id):
+        """1-based position of a waiting job, 0 if running, None if unknown/finished."""
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            for index, (pending_id, _) in enumerate(self._pending):
+                if pending_id == job_id:
+                    return index + 1
+        return None
+
+    def positions(self):
+        """Map of job_id -> 1-based queue position for every waiting job."""
+        with self._cond:
+            return {job_id: index + 1 for index, (job_id, _) in enumerate(self._pending)}
+
+    def depth(self):
+        """Number of jobs waiting for a worker."""
+        with self._cond:
+            return len(self._pending)
+
+    def running(self):
+        """Number of jobs currently being processed."""
+        with self._cond:
+            return len(self._running)
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job_id, args = self._pending.popleft()
+                self._running.add(job_id)
+                waiting = [pending_id for pending_id, _ in self._pending]
+            if self.on_advance is not None and waiting:
+                try:
+                    self.on_advance(waiting)
+                except Exception as e:
+                    logger.error(f"Queue advance callback failed: {e}")
+            try:
+                self.handler(job_id, *args)
+            except Exception as e:
+                logger.error(f"Unhandled error in job {job_id}: {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(job_id)
@@ -0,0 +1,61 @@
+"""landmark_store.py - Compact per-frame landmark storage
+
+Every job stores each frame's pose landmarks as a float32 (frames x 33 x 4)
+array of x, y, z, visibility (NaN when no pose was found) plus the frame
+timestamps in a compressed .npz, so it can be re-analyzed with different
+thresholds or rendered later without running pose inference again.
+"""
+
+import os
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+NUM_LANDMARKS = 33
+
+
+def landmarks_path_for(output_path):
+    """Where the landmarks for a processed video are stored"""
+    return os.path.splitext(output_path)[0] + '_landmarks.npz'
+
+
+def landmarks_to_array(pose_landmarks):
+    """NormalizedLandmarkList -> (33, 4) float32 array of x, y, z, visibility."""
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+        dtype=np.float32
+    )
+
+
+def array_to_landmarks(array):
+    """(33, 4) array -> NormalizedLandmarkList, or None for a frame without a pose."""
+    if np.isnan(array[0, 0]):
+        return None
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in array.tolist():
+        landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmark_list
+
+
+def save_landmarks(path, landmarks, timestamps, analyzed, **meta):
+    """Write one job's landmark arrays (and small meta values such as fps) in a single compressed file."""
+    arrays = {
+        "landmarks": landmarks.astype(np.float32, copy=False),
+        "timestamps": timestamps,
+        "analyzed": analyzed
+    }
+    for key, value in meta.items():
+        arrays[f"meta_{key}"] = np.array(value)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def load_landmarks(path):
+    """Load the arrays of a landmark file: landmarks, timestamps, analyzed and meta values."""
+    with np.load(path) as data:
+        stored = {
+            "landmarks": data["landmarks"],
+            "timestamps": data["timestamps"],
+            "analyzed": data["analyzed"]
+        }
+        stored["meta"] = {key[5:]: data[key].item() for key in data.files if key.startswith("meta_")}
+    return stored
@@ -9,23 +9,54 @@ import cv2
 import numpy as np
 import mediapipe as mp
 import base64
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import json
+import logging
+import os
+import threading
+import time
+import metrics
+from session_manager import SessionManager, LatestSlot
 
 app = Flask(__name__)
 CORS(app)
+logger = logging.getLogger(__name__)
+
+# WebSocket streaming endpoint (flask-sock, listed in requirements.txt)
+try:
+    from flask_sock import Sock
+    from simple_websocket import ConnectionClosed
+    sock = Sock(app)
+    WEBSOCKET_AVAILABLE = True
+except ImportError as e:
+    logger.warning(f"⚠️ flask-sock not installed, the /stream WebSocket endpoint is disabled "
+                   f"(pip install -r requirements.txt): {e}")
+    WEBSOCKET_AVAILABLE = False
 
 # Initialize MediaPipe Pose
 mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=1,
-    smooth_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+
+# Live sessions: each session_id has its own analyzer and a Pose graph leased from a bounded pool
+MAX_LIVE_SESSIONS = int(os.environ.get('MAX_LIVE_SESSIONS', 256))
+LIVE_POSE_GRAPHS = int(os.environ.get('LIVE_POSE_GRAPHS', 4))
+SESSION_IDLE_SECONDS = int(os.environ.get('SESSION_IDLE_SECONDS', 300))
+# Frames sent without a session_id share this session
+DEFAULT_SESSION_ID = 'default'
+# Largest batch accepted by /analyze_frames
+MAX_BATCH_FRAMES = int(os.environ.get('MAX_BATCH_FRAMES', 30))
+
+
+def create_live_pose():
+    """Pose graph with landmark smoothing/tracking for one live session's frame stream."""
+    return mp_pose.Pose(
+        static_image_mode=False,
+        model_complexity=1,
+        smooth_landmarks=True,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
 
 
 class SquatAnalyzer:
@@ -174,8 +205,33 @@ class SquatAnalyzer:
             }
 
 
-# Global analyzer instance
-analyzer = SquatAnalyzer()
+sessions = SessionManager(SquatAnalyzer, create_live_pose, max_sessions=MAX_LIVE_SESSIONS,
+                          max_pose_graphs=LIVE_POSE_GRAPHS, idle_timeout=SESSION_IDLE_SECONDS)
+sessions.warm_up(1)
+
+# GET /metrics (Prometheus text format)
+server_metrics = metrics.MetricsRegistry('pose_server')
+frames_analyzed = server_metrics.counter('frames_analyzed_total', 'Frames run through a Pose graph',
+                                         ('pose_detected',))
+frames_dropped = server_metrics.counter('frames_dropped_total',
+                                        'Frames dropped in favor of a newer frame of the same session', ('source',))
+frame_inference_seconds = server_metrics.histogram('frame_inference_seconds', 'Pose inference time per frame',
+                                                   buckets=metrics.FRAME_BUCKETS)
+frame_analysis_seconds = server_metrics.histogram('frame_analysis_seconds',
+                                                  'Time per frame from decoding to response, including waiting '
+                                                  'for the session', ('endpoint',))
+server_metrics.gauge('live_sessions', 'Live sessions held in memory',
+                     function=lambda: sessions.stats()['active_sessions'])
+server_metrics.gauge('pose_graphs', 'Pose graphs built for live sessions',
+                     function=lambda: sessions.stats()['pose_graphs'])
+server_metrics.counter('sessions_evicted_total', 'Live sessions dropped for the session limit or idle timeout',
+                       function=lambda: sessions.stats()['evicted_sessions'])
+
+
+def request_session_id(data=None):
+    """session_id from the JSON body or query string, falling back to the shared default session."""
+    session_id = (data or {}).get('session_id') or request.args.get('session_id')
+    return str(session_id) if session_id else DEFAULT_SESSION_ID
 
 
 @app.route('/health', methods=['GET'])
@@ -184,10 +240,107 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'service': 'pose_server',
-        'mediapipe_loaded': True
+        'mediapipe_loaded': True,
+        'websocket_available': WEBSOCKET_AVAILABLE,
+        'sessions': sessions.stats()
     })
 
 
+# Content types accepted as a raw (binary) frame body
+BINARY_FRAME_TYPES = ('image/jpeg', 'image/png', 'application/octet-stream')
+
+
+def decode_frame(buffer):
+    """Decode an encoded image straight from a bytes-like buffer (no intermediate copy); None if invalid."""
+    return cv2.imdecode(np.frombuffer(buffer, np.uint8), cv2.IMREAD_COLOR)
+
+
+def decode_base64_frame(frame_data):
+    """Decode a base64 image string (data-URL prefix allowed)."""
+    if ',' in frame_data:
+        frame_data = frame_data.split(',')[1]
+    return decode_frame(base64.b64decode(frame_data))
+
+
+def binary_frame_params():
+    """session_id, timestamp and include_landmarks of a binary frame, from X- headers or the query string."""
+    params = {}
+    for name, header in (('session_id', 'X-Session-Id'), ('timestamp', 'X-Timestamp'),
+                         ('include_landmarks', 'X-Include-Landmarks')):
+        value = request.headers.get(header, request.args.get(name))
+        if value is not None:
+            params[name] = value
+    if 'timestamp' in params:
+        try:
+            params['timestamp'] = float(params['timestamp'])
+        except ValueError:
+            pass
+    if 'include_landmarks' in params:
+        params['include_landmarks'] = params['include_landmarks'].lower() in ('1', 'true', 'yes')
+    return params
+
+
+def analyze_session_frame(session, frame, include_landmarks=False, timestamp=None):
+    """Run one BGR frame through a held session's Pose graph and analyzer; returns the response dict."""
+    # Convert BGR to RGB
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    # Process with this session's Pose graph and analyzer
+    start = time.perf_counter()
+    results = session.pose.process(rgb_frame)
+    frame_inference_seconds.observe(time.perf_counter() - start)
+    frames_analyzed.inc(pose_detected=bool(results.pose_landmarks))
+    analysis = None
+    if results.pose_landmarks:
+        # Run autonomous analysis
+        analysis = session.analyzer.analyze_squat_form(results.pose_landmarks.landmark)
+    session_id = session.session_id
+
+    if not results.pose_landmarks:
+        return {
+            'success': True,
+            'pose_detected': False,
+            'session_id': session_id,
+            'dropped_frames': session.dropped_frames,
+            'message': 'No pose detected in frame'
+        }
+
+    response = {
+        'success': True,
+        'pose_detected': True,
+        'analysis': analysis,
+        'session_id': session_id,
+        'dropped_frames': session.dropped_frames,
+        'timestamp': timestamp
+    }
+
+    # Optionally include landmark coordinates
+    if include_landmarks:
+        response['landmarks'] = [
+            {
+                'x': landmark.x,
+                'y': landmark.y,
+                'z': landmark.z,
+                'visibility': landmark.visibility
+            }
+            for landmark in results.pose_landmarks.landmark
+        ]
+    return response
+
+
+def dropped_frame_response(session_id):
+    """Response for a frame that was superseded by a newer one before it was analyzed."""
+    session = sessions.get(session_id)
+    return {
+        'success': True,
+        'pose_detected': False,
+        'dropped': True,
+        'session_id': session_id,
+        'dropped_frames': session.dropped_frames if session is not None else 0,
+        'message': 'Frame dropped in favor of a newer frame'
+    }
+
+
 @app.route('/analyze_frame', methods=['POST'])
 def analyze_frame():
     """Process a single video frame and return pose analysis.
@@ -197,6 +350,11 @@ def analyze_frame():
         'frame': 'base64_encoded_image_string',
         'session_id': 'optional_session_identifier'
     }
+
+    Or a raw image body (Content-Type image/jpeg, image/png or
+    application/octet-stream) with session_id, timestamp and
+    include_landmarks in X-Session-Id / X-Timestamp / X-Include-Landmarks
+    headers or the query string.
     
     Returns:
     {
@@ -213,23 +371,23 @@ def analyze_frame():
         'landmarks': list (optional)
     }
     """
+    started = time.perf_counter()
     try:
-        data = request.get_json()
-        
-        if 'frame' not in data:
-            return jsonify({
-                'success': False,
-                'error': 'No frame data provided'
-            }), 400
-        
-        # Decode base64 image
-        frame_data = data['frame']
-        if ',' in frame_data:
-            frame_data = frame_data.split(',')[1]
-        
-        img_bytes = base64.b64decode(frame_data)
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if request.mimetype in BINARY_FRAME_TYPES:
+            # Decode the body in place: no JSON parsing and no base64 round trip
+            data = binary_frame_params()
+            frame = decode_frame(request.get_data(cache=False))
+        else:
+            data = request.get_json()
+            
+            if 'frame' not in data:
+                return jsonify({
+                    'success': False,
+                    'error': 'No frame data provided'
+                }), 400
+            
+            # Decode base64 image
+            frame = decode_base64_frame(data['frame'])
         
         if frame is None:
             return jsonify({
@@ -237,45 +395,110 @@ def analyze_frame():
                 'error': 'Failed to decode image'
             }), 400
         
-        # Convert BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Process with MediaPipe
-        results = pose.process(rgb_frame)
-        
-        if results.pose_landmarks:
-            # Run autonomous analysis
-            analysis = analyzer.analyze_squat_form(results.pose_landmarks.landmark)
-            
-            # Optionally include landmark coordinates
-            landmarks_data = []
-            if data.get('include_landmarks', False):
-                for landmark in results.pose_landmarks.landmark:
-                    landmarks_data.append({
-                        'x': landmark.x,
-                        'y': landmark.y,
-                        'z': landmark.z,
-                        'visibility': landmark.visibility
-                    })
-            
-            response = {
-                'success': True,
-                'pose_detected': True,
-                'analysis': analysis,
-                'timestamp': data.get('timestamp', None)
-            }
-            
-            if landmarks_data:
-                response['landmarks'] = landmarks_data
+        # Latest frame wins: a frame still waiting when a newer one arrives is dropped
+        session_id = request_session_id(data)
+        with sessions.latest_frame(session_id) as session:
+            if session is None:
+                frames_dropped.inc(source='http')
+                return jsonify(dropped_frame_response(session_id))
+            response = analyze_session_frame(session, frame,
+                                             include_landmarks=data.get('include_landmarks', False),
+                                             timestamp=data.get('timestamp', None))
+        frame_analysis_seconds.observe(time.perf_counter() - started, endpoint='analyze_frame')
+        return jsonify(response)
             
-            return jsonify(response)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/analyze_frames', methods=['POST'])
+def analyze_frames():
+    """Process an ordered batch of frames for one session in a single request.
+
+    Expected JSON payload:
+    {
+        'frames': ['base64_image', ...] or [{'frame': 'base64_image', 'timestamp': 1.0}, ...],
+        'session_id': 'optional_session_identifier',
+        'include_landmarks': false
+    }
+
+    Or multipart/form-data with the raw images as repeated 'frames' files
+    (in order) and optional session_id, include_landmarks and comma-separated
+    timestamps form fields.
+
+    Frames run back to back through the session's Pose graph. Returns
+    per-frame results (same shape as /analyze_frame, with their index)
+    plus the session's squat_count and squat_state after the batch.
+    """
+    started = time.perf_counter()
+    try:
+        if request.files:
+            data = request.form
+            images = [file.read() for file in request.files.getlist('frames')]
+            timestamps = [t for t in data.get('timestamps', '').split(',') if t.strip()]
+            items = [{'image': image, 'timestamp': float(timestamps[i]) if i < len(timestamps) else None}
+                     for i, image in enumerate(images)]
+            include_landmarks = data.get('include_landmarks', '').lower() in ('1', 'true', 'yes')
         else:
+            data = request.get_json()
+            items = []
+            for entry in data.get('frames', []):
+                if isinstance(entry, dict):
+                    items.append({'frame': entry.get('frame', ''), 'timestamp': entry.get('timestamp')})
+                else:
+                    items.append({'frame': entry, 'timestamp': None})
+            include_landmarks = data.get('include_landmarks', False)
+
+        if not items:
             return jsonify({
-                'success': True,
-                'pose_detected': False,
-                'message': 'No pose detected in frame'
-            })
-            
+                'success': False,
+                'error': 'No frames provided'
+            }), 400
+        if len(items) > MAX_BATCH_FRAMES:
+            return jsonify({
+                'success': False,
+                'error': f'Too many frames ({len(items)}); the limit is {MAX_BATCH_FRAMES}'
+            }), 413
+
+        # Decode everything before taking the session, so it is held only for inference
+        for item in items:
+            try:
+                item['decoded'] = decode_frame(item['image']) if 'image' in item else decode_base64_frame(item['frame'])
+            except ValueError:
+                item['decoded'] = None
+
+        session_id = request_session_id(data)
+        results = []
+        with sessions.session(session_id) as session:
+            for index, item in enumerate(items):
+                if item['decoded'] is None:
+                    result = {'success': False, 'error': 'Failed to decode image'}
+                else:
+                    result = analyze_session_frame(session, item['decoded'], include_landmarks=include_landmarks,
+                                                   timestamp=item['timestamp'])
+                    result.pop('session_id', None)
+                    result.pop('dropped_frames', None)
+                result['index'] = index
+                results.append(result)
+            squat_count = session.analyzer.squat_count
+            squat_state = session.analyzer.squat_state
+            dropped_frames = session.dropped_frames
+        frame_analysis_seconds.observe((time.perf_counter() - started) / len(items), count=len(items),
+                                       endpoint='analyze_frames')
+
+        return jsonify({
+            'success': True,
+            'session_id': session_id,
+            'frames': len(items),
+            'results': results,
+            'squat_count': squat_count,
+            'squat_state': squat_state,
+            'dropped_frames': dropped_frames
+        })
+
     except Exception as e:
         return jsonify({
             'success': False,
@@ -283,25 +506,142 @@ def analyze_frame():
         }), 500
 
 
+def stream_message_response(session_id, message, include_landmarks):
+    """Response to one /stream frame: a binary image or a parsed JSON message shaped like /analyze_frame."""
+    try:
+        if isinstance(message, dict):
+            data = message
+            if 'frame' not in data:
+                return {'success': False, 'error': 'No frame data provided'}
+            frame = decode_base64_frame(data['frame'])
+        else:
+            data = {}
+            frame = decode_frame(message)
+
+        if frame is None:
+            return {'success': False, 'error': 'Failed to decode image'}
+        with sessions.session(session_id) as session:
+            return analyze_session_frame(session, frame,
+                                         include_landmarks=data.get('include_landmarks', include_landmarks),
+                                         timestamp=data.get('timestamp', None))
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+
+def _stream_worker(ws, session_id, slot, include_landmarks):
+    """Analyze a connection's newest frame and send each result as soon as it is ready."""
+    while True:
+        item = slot.get()
+        if item is None:
+            return
+        frame_id, message = item
+        started = time.perf_counter()
+        response = stream_message_response(session_id, message, include_landmarks)
+        frame_analysis_seconds.observe(time.perf_counter() - started, endpoint='stream')
+        response['frame_id'] = frame_id
+        try:
+            ws.send(json.dumps(response))
+        except ConnectionClosed:
+            return
+
+
+def stream_session(ws):
+    """Full-duplex live analysis bound to one session.
+
+    Connect to /stream?session_id=...&include_landmarks=true and send
+    frames as binary messages (JPEG/PNG) or JSON text messages shaped like
+    the /analyze_frame payload; {"type": "reset"} resets the session.
+    Results are JSON with a frame_id (0, 1, 2, ... in send order). The next frame is received while the current one
+    is being inferred; if a newer frame arrives before it is picked up,
+    the waiting one is dropped (its frame_id gets no result) and counted
+    in dropped_frames.
+    """
+    session_id = request_session_id()
+    include_landmarks = request.args.get('include_landmarks', '').lower() in ('1', 'true', 'yes')
+    slot = LatestSlot()
+    worker = threading.Thread(target=_stream_worker, args=(ws, session_id, slot, include_landmarks),
+                              daemon=True)
+    worker.start()
+
+    frame_id = 0
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                break
+            if isinstance(message, str):
+                try:
+                    message = json.loads(message)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    message = {}  # invalid JSON or not an object: answered with "No frame data provided"
+                # Control messages are applied right away so they can't be dropped like frames
+                if message.get('type') == 'reset':
+                    sessions.reset(session_id)
+                    continue
+            if slot.put((frame_id, message)):
+                sessions.add_dropped(session_id)
+                frames_dropped.inc(source='stream')
+            frame_id += 1
+    except ConnectionClosed:
+        pass
+    finally:
+        slot.close()
+        worker.join()
+
+
+if WEBSOCKET_AVAILABLE:
+    sock.route('/stream')(stream_session)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Frame, inference latency, dropped frame and live session metrics in Prometheus text format."""
+    return Response(server_metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/reset_session', methods=['POST'])
 def reset_session():
-    """Reset the analyzer state for a new workout session."""
-    global analyzer
-    analyzer = SquatAnalyzer()
+    """Reset one session's analyzer state for a new workout session."""
+    session_id = request_session_id(request.get_json(silent=True))
+    sessions.reset(session_id)
     return jsonify({
         'success': True,
+        'session_id': session_id,
         'message': 'Session reset successfully'
     })
 
 
+@app.route('/end_session', methods=['POST'])
+def end_session():
+    """Drop a session and return its Pose graph to the pool."""
+    session_id = request_session_id(request.get_json(silent=True))
+    if not sessions.end(session_id):
+        return jsonify({
+            'success': False,
+            'error': 'Session not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'message': 'Session ended'
+    })
+
+
 @app.route('/get_stats', methods=['GET'])
 def get_stats():
     """Get current session statistics."""
+    session_id = request_session_id()
+    session = sessions.get(session_id)
+    analyzer = session.analyzer if session is not None else SquatAnalyzer()
     return jsonify({
         'success': True,
+        'session_id': session_id,
         'stats': {
             'squat_count': analyzer.squat_count,
-            'current_state': analyzer.squat_state
+            'current_state': analyzer.squat_state,
+            'dropped_frames': session.dropped_frames if session is not None else 0
         }
     })
 
@@ -311,5 +651,6 @@ if __name__ == '__main__':
     print("Pose Estimation Server Starting")
     print("Autonomous squat analysis with MediaPipe")
     print("Rule-driven feedback - no human labeling required")
+    print(f"WebSocket /stream: {'enabled' if WEBSOCKET_AVAILABLE else 'disabled (pip install flask-sock)'}")
     print("="*60)
     app.run(host='0.0.0.0', port=5001, debug=True)
@@ -0,0 +1,48 @@
+"""pose_utils.py - MediaPipe Pose helpers shared by the exercise counters."""
+
+import os
+import cv2
+import mediapipe as mp
+
+mp_pose = mp.solutions.pose
+
+# Longest side (px) of the frame handed to MediaPipe; 0 keeps the full resolution.
+# Landmarks are normalized, so they map back onto any output resolution.
+INFERENCE_MAX_SIDE = int(os.environ.get('INFERENCE_MAX_SIDE', 480))
+# Longest side (px) of the annotated output video; 0 keeps the input resolution
+OUTPUT_MAX_SIDE = int(os.environ.get('OUTPUT_MAX_SIDE', 0))
+
+
+def create_pose():
+    """Build the Pose graph used for recorded-video analysis."""
+    return mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+
+def reset_pose(pose):
+    """Reset a reused Pose graph so tracking state from the previous video doesn't leak into the next."""
+    pose.reset()
+
+
+def scaled_size(width, height, max_side):
+    """(width, height) shrunk so the longest side is at most max_side (unchanged when max_side is 0)."""
+    longest = max(width, height)
+    if not max_side or longest <= max_side:
+        return width, height
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def resize_max_side(frame, max_side):
+    """Downscale a frame so its longest side is at most max_side."""
+    height, width = frame.shape[:2]
+    size = scaled_size(width, height, max_side)
+    if size == (width, height):
+        return frame
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+def prepare_inference_frame(frame, max_side=INFERENCE_MAX_SIDE):
+    """Downscale a BGR frame for inference and convert it to a read-only RGB image for MediaPipe."""
+    image_rgb = cv2.cvtColor(resize_max_side(frame, max_side), cv2.COLOR_BGR2RGB)
+    image_rgb.flags.writeable = False
+    return image_rgb
@@ -0,0 +1,82 @@
+"""pose_workers.py - Process-pool execution engine for video jobs
+
+Each worker is a long-lived process that builds its MediaPipe Pose graph
+once (in the pool initializer) and reuses it for every job it runs, so
+jobs use all cores without paying per-job model initialization or
+contending for the Flask process's GIL.
+"""
+
+import multiprocessing
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Per-process warm Pose graph, created by _init_worker
+_pose = None
+
+# Seconds warm_up waits for every worker to build its Pose graph
+WARM_UP_TIMEOUT = 120
+
+
+def _init_worker():
+    global _pose
+    from pose_utils import create_pose
+    _pose = create_pose()
+
+
+def _warm_up(barrier, timeout):
+    """Hold this worker until all workers are running a warm-up task, so each one runs exactly one."""
+    barrier.wait(timeout)
+    return os.getpid() if _pose is not None else None
+
+
+def run_job(exercise_type, input_path, output_path, render=True):
+    """Entry point executed inside a worker process."""
+    if exercise_type == "pushup":
+        from pushup_counter import process_pushup_video
+        return process_pushup_video(input_path, output_path, pose=_pose, render=render)
+    from squat_counter import process_squat_video
+    return process_squat_video(input_path, output_path, pose=_pose, render=render)
+
+
+class PoseWorkerPool:
+    """Pool of worker processes, each holding one warm Pose graph."""
+
+    def __init__(self, num_workers):
+        self.num_workers = max(1, int(num_workers))
+        # spawn (not fork): the parent is a threaded Flask process
+        self._context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            mp_context=self._context,
+            initializer=_init_worker
+        )
+
+    def warm_up(self):
+        """
+        Start every worker process so Pose graphs are loaded before the first upload.
+        The warm-up tasks wait on a shared barrier: an idle worker can't take a second
+        one, so all num_workers processes must start and run their initializer.
+        """
+        pids = set()
+        with self._context.Manager() as manager:
+            barrier = manager.Barrier(self.num_workers)
+            futures = [self._executor.submit(_warm_up, barrier, WARM_UP_TIMEOUT) for _ in range(self.num_workers)]
+            for future in futures:
+                try:
+                    pid = future.result()
+                except threading.BrokenBarrierError:
+                    continue
+                if pid is not None:
+                    pids.add(pid)
+        logger.info(f"Pose worker pool ready: {len(pids)}/{self.num_workers} workers")
+
+    def run(self, exercise_type, input_path, output_path, render=True):
+        """Run a job in a worker process and block until its result is available."""
+        return self._executor.submit(run_job, exercise_type, input_path, output_path, render).result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,264 @@
+"""rep_engine.py - Vectorized rep-analysis engine shared by the exercise counters
+
+Works on a whole landmark array (frames x 33 x 4, NaN rows where no pose
+was detected). Joint angles, side selection, smoothing and per-frame form
+checks are batched NumPy operations; only the rep state machine is a thin
+scan over the resulting arrays.
+
+The same state machine (RepScanner) can also be fed one frame at a time:
+StreamingScan pairs it with the streaming equivalents of the smoothing and
+feedback steps, so a render can draw each frame's overlay as soon as the
+frame is inferred, with the values the whole-array analysis produces.
+"""
+
+import collections
+import numpy as np
+
+# Stage codes used in the per-frame stage array
+STAGE_NONE, STAGE_UP, STAGE_DOWN = 0, 1, 2
+STAGE_NAMES = {STAGE_NONE: None, STAGE_UP: "up", STAGE_DOWN: "down"}
+
+
+def valid_frames(landmarks, analyzed):
+    """Frames that were analyzed and had a pose detected."""
+    return analyzed & ~np.isnan(landmarks[:, 0, 0])
+
+
+def joint_angles(a, b, c):
+    """Angle at b (degrees, 0-180) for (N, 2) arrays of points a, b, c."""
+    radians = np.arctan2(c[:, 1] - b[:, 1], c[:, 0] - b[:, 0]) - np.arctan2(a[:, 1] - b[:, 1], a[:, 0] - b[:, 0])
+    angle = np.abs(radians * 180.0 / np.pi)
+    return np.where(angle > 180.0, 360.0 - angle, angle)
+
+
+def select_side(landmarks, left_indices, right_indices):
+    """
+    Pick the more visible side per frame (left wins ties).
+    Returns (use_left bool array, (N, len(indices), 4) points of the chosen side).
+    """
+    left_vis = landmarks[:, left_indices, 3].sum(axis=1)
+    right_vis = landmarks[:, right_indices, 3].sum(axis=1)
+    use_left = left_vis >= right_vis
+    points = np.where(use_left[:, None, None], landmarks[:, left_indices], landmarks[:, right_indices])
+    return use_left, points.astype(np.float64)
+
+
+def causal_rolling_mean(values, valid, window=5):
+    """
+    Mean of the last `window` valid values at each valid frame (NaN elsewhere),
+    matching a deque(maxlen=window) that is only appended to on valid frames.
+    """
+    out = np.full(len(values), np.nan)
+    compact = values[valid].astype(np.float64)
+    if len(compact) == 0:
+        return out
+    cumsum = np.concatenate(([0.0], np.cumsum(compact)))
+    ends = np.arange(1, len(compact) + 1)
+    starts = np.maximum(ends - window, 0)
+    out[valid] = (cumsum[ends] - cumsum[starts]) / (ends - starts)
+    return out
+
+
+class RepScanner:
+    """
+    Hysteresis rep state machine, advanced one valid frame at a time.
+
+    Flags are OR-ed into the current rep (before the frame's stage transition)
+    and cleared when a descent starts. Finished reps are kept in `reps` with
+    their start/end times, end frame, min angle and flags.
+    """
+
+    def __init__(self, up_threshold, start_down_threshold, flag_names=()):
+        self.up_threshold = up_threshold
+        self.start_down_threshold = start_down_threshold
+        self.flag_names = tuple(flag_names)
+        self.stage = STAGE_NONE
+        self.rep_count = 0
+        self.rep_start = None
+        self.rep_min = None
+        self.rep_max = None
+        self.rep_flags = {name: False for name in self.flag_names}
+        self.reps = []
+
+    def step(self, index, value, timestamp, flag_values=()):
+        """Advance by one valid frame; returns the rep finished on this frame, or None."""
+        for name, flagged in zip(self.flag_names, flag_values):
+            if flagged:
+                self.rep_flags[name] = True
+
+        # Initialize stage if unknown
+        if self.stage == STAGE_NONE:
+            self.stage = STAGE_UP if value > self.up_threshold else STAGE_DOWN
+
+        if self.stage == STAGE_UP:
+            # Look for descent start
+            if value < self.start_down_threshold:
+                self.stage = STAGE_DOWN
+                self.rep_start = timestamp
+                self.rep_min = self.rep_max = value
+                self.rep_flags = {name: False for name in self.flag_names}
+            return None
+
+        if self.rep_min is None or value < self.rep_min:
+            self.rep_min = value
+        if self.rep_max is None or value > self.rep_max:
+            self.rep_max = value
+        # Rose back up past the up threshold -> rep finished
+        if value <= self.up_threshold:
+            return None
+        rep = {
+            "start": self.rep_start,
+            "end": timestamp,
+            "end_frame": index,
+            "duration": timestamp - self.rep_start if self.rep_start is not None else 0.0,
+            "min_angle": self.rep_min,
+            "flags": self.rep_flags
+        }
+        self.reps.append(rep)
+        self.rep_count += 1
+        self.rep_start = self.rep_min = self.rep_max = None
+        self.rep_flags = {name: False for name in self.flag_names}
+        self.stage = STAGE_UP
+        return rep
+
+
+def scan_reps(angle, valid, timestamps, up_threshold, start_down_threshold, flags=None):
+    """
+    Thin scan of RepScanner over a smoothed angle array.
+
+    flags: name -> per-frame bool array (see RepScanner).
+
+    Returns per-frame arrays (stage, rep_count, min_angle, max_angle and the
+    accumulated flags) plus the list of finished reps.
+    """
+    flags = flags or {}
+    n = len(angle)
+    stage_out = np.zeros(n, dtype=np.int8)
+    count_out = np.zeros(n, dtype=np.int32)
+    min_out = np.full(n, np.nan, dtype=np.float32)
+    max_out = np.full(n, np.nan, dtype=np.float32)
+    flag_out = {name: np.zeros(n, dtype=bool) for name in flags}
+
+    angles = angle.tolist()
+    valid_list = valid.tolist()
+    times = timestamps.tolist()
+    flag_lists = [values.tolist() for values in flags.values()]
+
+    scanner = RepScanner(up_threshold, start_down_threshold, flags)
+    for i in range(n):
+        if valid_list[i]:
+            scanner.step(i, angles[i], times[i], [values[i] for values in flag_lists])
+
+        stage_out[i] = scanner.stage
+        count_out[i] = scanner.rep_count
+        if scanner.rep_min is not None:
+            min_out[i] = scanner.rep_min
+            max_out[i] = scanner.rep_max
+        for name in flags:
+            flag_out[name][i] = scanner.rep_flags[name]
+
+    return {
+        "stage": stage_out,
+        "rep_count": count_out,
+        "min_angle": min_out,
+        "max_angle": max_out,
+        "flags": flag_out,
+        "reps": scanner.reps
+    }
+
+
+def feedback_per_frame(timestamps, reps, feedback, duration):
+    """Index into `feedback` of the rep feedback visible at each frame (-1 when none)."""
+    out = np.full(len(timestamps), -1, dtype=np.int32)
+    if not reps:
+        return out
+    end_times = np.array([rep["end"] for rep in reps])
+    last = np.searchsorted(end_times, timestamps, side="right") - 1
+    has_rep = last >= 0
+    elapsed = timestamps - end_times[np.maximum(last, 0)]
+    visible = has_rep & (elapsed < duration)
+    out[visible] = last[visible]
+    return out
+
+
+def tempo_stats(reps):
+    durations = [rep["duration"] for rep in reps]
+    return {
+        "average": round(float(np.mean(durations)), 2) if durations else 0.0,
+        "fastest": round(float(np.min(durations)), 2) if durations else 0.0,
+        "slowest": round(float(np.max(durations)), 2) if durations else 0.0
+    }
+
+
+def frame_records(columns, analyzed):
+    """
+    Turn per-frame column arrays into overlay record dicts (None for frames that
+    weren't analyzed). NaN floats and -1 ids become None.
+    """
+    lists = {name: values.tolist() for name, values in columns.items()}
+    records = []
+    for i, was_analyzed in enumerate(analyzed.tolist()):
+        if not was_analyzed:
+            records.append(None)
+            continue
+        record = {}
+        for name, values in lists.items():
+            value = values[i]
+            record[name] = None if isinstance(value, float) and value != value else value
+        records.append(record)
+    return records
+
+
+class RollingMean:
+    """Streaming causal_rolling_mean: mean of the last `window` values pushed."""
+
+    def __init__(self, window=5):
+        self.values = collections.deque(maxlen=window)
+
+    def push(self, value):
+        self.values.append(float(value))
+        return sum(self.values) / len(self.values)
+
+
+class StreamingScan:
+    """
+    Frame-at-a-time counterpart of causal_rolling_mean + scan_reps +
+    feedback_per_frame for one exercise. rep_feedback(rep) returns the
+    on-screen feedback of a finished rep.
+    """
+
+    def __init__(self, up_threshold, start_down_threshold, flag_names, rep_feedback, feedback_seconds, window=5):
+        self.smoother = RollingMean(window)
+        self.scanner = RepScanner(up_threshold, start_down_threshold, flag_names)
+        self.rep_feedback = rep_feedback
+        self.feedback_seconds = feedback_seconds
+        self._feedback = None
+        self._feedback_end = None
+
+    def step(self, index, valid, angle, timestamp, flag_values=()):
+        """Feed one analyzed frame; returns its smoothed angle (None when no pose was detected)."""
+        if not valid:
+            return None
+        smooth_angle = self.smoother.push(angle)
+        rep = self.scanner.step(index, smooth_angle, timestamp, flag_values)
+        if rep is not None:
+            self._feedback = self.rep_feedback(rep)
+            self._feedback_end = rep["end"]
+        return smooth_angle
+
+    def feedback_at(self, timestamp):
+        """Feedback of the last finished rep while it is on screen, else None."""
+        if self._feedback_end is None or timestamp - self._feedback_end >= self.feedback_seconds:
+            return None
+        return self._feedback
+
+    def state(self):
+        """Overlay fields from the rep state after the latest frame."""
+        scanner = self.scanner
+        return {
+            "stage": STAGE_NAMES[scanner.stage],
+            "rep_count": scanner.rep_count,
+            "min_angle": scanner.rep_min,
+            "max_angle": scanner.rep_max,
+            **scanner.rep_flags
+        }
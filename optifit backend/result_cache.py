@@ -0,0 +1,160 @@
+"""result_cache.py - Content-addressed cache of analysis results
+
+Results are keyed by (video content hash, exercise type, analyzer version),
+so re-submitted or retried uploads of identical bytes are answered without
+running MediaPipe again. Processed videos, and the landmark and telemetry
+files a hit needs for /reanalyze, telemetry export and deferred renders,
+are kept in the cache folder; total size is bounded with least-recently-used
+eviction, and the index is stored as JSON so the cache survives restarts.
+"""
+
+import collections
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'index.json'
+
+
+def make_key(content_hash, exercise_type, analyzer_version):
+    return f"{content_hash}:{exercise_type}:{analyzer_version}"
+
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst (no extra disk use), falling back to a copy across filesystems."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+class ResultCache:
+    """Size-bounded LRU cache of job results and processed videos, persisted on disk."""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(cache_dir, INDEX_FILENAME)
+        self._entries = collections.OrderedDict()  # key -> entry, least recently used first
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self._index_path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in sorted(stored.items(), key=lambda item: item[1].get('last_used', 0)):
+            stored_files = [entry.get('video')] + list(entry.get('files', {}).values())
+            if not all(os.path.exists(os.path.join(self.cache_dir, name)) for name in stored_files if name):
+                continue
+            self._entries[key] = entry
+        logger.info(f"Result cache loaded: {len(self._entries)} entries")
+
+    def _persist(self):
+        tmp_path = self._index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _total_bytes(self):
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def _remove_files(self, entry):
+        for name in [entry.get('video')] + list(entry.get('files', {}).values()):
+            if name:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+
+    def _evict(self):
+        while self._entries and self._total_bytes() > self.max_bytes:
+            key, entry = self._entries.popitem(last=False)
+            self._remove_files(entry)
+            logger.info(f"Evicted cached result: {key}")
+
+    def get(self, key, need_video=False):
+        """
+        Return the cached entry for key (marking it recently used), or None on a miss.
+        The new LRU order is only kept in memory; the next put or eviction writes it to the index.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (need_video and not entry.get('video')):
+                return None
+            entry['last_used'] = time.time()
+            self._entries.move_to_end(key)
+            return entry
+
+    def video_path(self, entry):
+        return os.path.join(self.cache_dir, entry['video']) if entry.get('video') else None
+
+    def file_path(self, entry, name):
+        """Path of a cached job file ('landmarks', 'telemetry'), or None when the entry has none."""
+        filename = entry.get('files', {}).get(name)
+        return os.path.join(self.cache_dir, filename) if filename else None
+
+    def put(self, key, result, video_path=None, files=None):
+        """
+        Store a finished job's result, its processed video when there is one, and
+        its other files (files: {'landmarks': path, 'telemetry': path}).
+        """
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._remove_files(old)
+            entry = {'result': result, 'video': None, 'files': {}, 'size': len(json.dumps(result)),
+                     'last_used': time.time()}
+            self._entries[key] = entry
+            self._store_video(key, entry, video_path)
+            for name, path in (files or {}).items():
+                filename = self._store_file(key, entry, path, f"_{name}")
+                if filename:
+                    entry['files'][name] = filename
+            self._evict()
+            self._persist()
+
+    def attach_video(self, key, video_path):
+        """Add a video rendered later (analysis-only jobs) to an existing entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.get('video'):
+                return
+            self._store_video(key, entry, video_path)
+            self._evict()
+            self._persist()
+
+    def _store_video(self, key, entry, video_path):
+        filename = self._store_file(key, entry, video_path)
+        if filename:
+            entry['video'] = filename
+
+    def _store_file(self, key, entry, path, suffix=""):
+        """Link path into the cache folder and count it in the entry's size; returns its cached name"""
+        if not path or not os.path.exists(path):
+            return None
+        size = os.path.getsize(path)
+        if size > self.max_bytes:
+            return None
+        filename = key.replace(':', '_') + suffix + os.path.splitext(path)[1]
+        link_or_copy(path, os.path.join(self.cache_dir, filename))
+        entry['size'] += size
+        return filename
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes(),
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,250 @@
+"""retention.py - Per-job storage retention with a TTL and a disk quota
+
+Every job's files (upload, processed video, landmarks, telemetry, HLS
+directory) are registered under its job id. A job's TTL starts when it
+finishes; expiry times sit in a heap, and one thread sleeps until the
+earliest of them, so files are removed on time instead of by a periodic
+directory sweep. When the tracked files exceed the quota, finished jobs are
+evicted least recently used first. Whenever a job's files are removed the
+on_evict callback runs, so the server can drop the job record as well.
+Queued and running jobs are never evicted. Resumable upload sessions are
+tracked too (with their own idle TTL), so abandoned ones expire and count
+against the quota.
+"""
+
+import collections
+import heapq
+import logging
+import os
+import shutil
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Key prefix of files found on disk at startup that belong to no known job
+ORPHAN_PREFIX = "orphan:"
+# Key prefix of resumable upload sessions (uploads.ChunkedUploadStore)
+UPLOAD_PREFIX = "upload:"
+
+
+def path_size(path):
+    """Bytes used by a file, or by every file under a directory (0 when missing)."""
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+    except OSError:
+        return 0
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def remove_path(path):
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except OSError:
+        pass
+
+
+class RetentionManager:
+    """Index of job artifacts with TTL expiry (time-ordered heap) and LRU eviction above max_bytes."""
+
+    def __init__(self, ttl_seconds, max_bytes, on_evict=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self._entries = collections.OrderedDict()  # key -> entry, least recently used first
+        self._owners = {}  # artifact path -> key
+        self._heap = []  # (expires_at, key); stale items are skipped when popped
+        self._bytes = 0
+        self._evicted = {"ttl": 0, "quota": 0}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        """Start the expiry thread (idempotent)."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._expiry_loop, name="retention", daemon=True)
+            self._thread.start()
+
+    def adopt_orphans(self, folders):
+        """
+        Track files left in folders by an earlier run (no job knows about them):
+        each expires ttl_seconds after it was last modified and counts against the quota.
+        """
+        adopted = 0
+        with self._cond:
+            for folder in folders:
+                if not os.path.isdir(folder):
+                    continue
+                for name in os.listdir(folder):
+                    path = os.path.abspath(os.path.join(folder, name))
+                    if path in self._owners:
+                        continue
+                    try:
+                        modified = os.path.getmtime(path)
+                    except OSError:
+                        continue
+                    key = ORPHAN_PREFIX + path
+                    self._add_locked(key, [path], busy=False, expires_at=modified + self.ttl_seconds)
+                    adopted += 1
+            self._cond.notify_all()
+        if adopted:
+            logger.info(f"Retention: tracking {adopted} files left by a previous run")
+        self._enforce_quota()
+
+    def track(self, job_id, paths):
+        """Register a queued job's files; it is protected from eviction until finish()."""
+        with self._cond:
+            self._add_locked(job_id, paths, busy=True, expires_at=None)
+
+    def finish(self, job_id, paths=(), ttl_seconds=None):
+        """Add a finished job's output files and start its TTL (ttl_seconds overrides the default)."""
+        with self._cond:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                entry = self._add_locked(job_id, paths, busy=False, expires_at=None)
+            else:
+                self._attach_locked(job_id, entry, paths)
+                entry["busy"] = False
+            self._refresh_locked(entry)
+            entry["expires_at"] = time.time() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+            heapq.heappush(self._heap, (entry["expires_at"], job_id))
+            self._entries.move_to_end(job_id)
+            self._cond.notify_all()
+        self._enforce_quota()
+
+    def refresh(self, job_id):
+        """Re-measure a job's files after they changed (e.g. a deferred render wrote its video)."""
+        with self._cond:
+            entry = self._entries.get(job_id)
+            if entry is not None:
+                self._refresh_locked(entry)
+        self._enforce_quota()
+
+    def touch(self, job_id):
+        """Mark a job as recently used (it is evicted last under quota pressure)."""
+        with self._cond:
+            if job_id in self._entries:
+                self._entries.move_to_end(job_id)
+
+    def owner(self, path):
+        """Job id whose artifacts include path (directly or inside a tracked directory), or None."""
+        path = os.path.abspath(path)
+        with self._cond:
+            while True:
+                key = self._owners.get(path)
+                if key is not None:
+                    return key
+                parent = os.path.dirname(path)
+                if parent == path:
+                    return None
+                path = parent
+
+    def forget(self, key):
+        """Stop tracking key and leave its files alone (their owner moved or removed them)."""
+        with self._cond:
+            self._pop_locked(key)
+
+    def discard(self, job_id):
+        """Remove a job's files and record now (on_evict is not called)."""
+        with self._cond:
+            entry = self._pop_locked(job_id)
+        if entry is not None:
+            self._remove_files(entry)
+
+    def _add_locked(self, key, paths, busy, expires_at):
+        entry = {"paths": [], "size": 0, "busy": busy, "expires_at": expires_at}
+        self._entries[key] = entry
+        self._attach_locked(key, entry, paths)
+        self._refresh_locked(entry)
+        if expires_at is not None:
+            heapq.heappush(self._heap, (expires_at, key))
+        return entry
+
+    def _attach_locked(self, key, entry, paths):
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in entry["paths"]:
+                entry["paths"].append(path)
+                self._owners[path] = key
+
+    def _refresh_locked(self, entry):
+        size = sum(path_size(path) for path in entry["paths"])
+        self._bytes += size - entry["size"]
+        entry["size"] = size
+
+    def _pop_locked(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry["size"]
+        for path in entry["paths"]:
+            if self._owners.get(path) == key:
+                del self._owners[path]
+        return entry
+
+    def _remove_files(self, entry):
+        for path in entry["paths"]:
+            remove_path(path)
+
+    def _evict(self, key, entry, reason):
+        self._remove_files(entry)
+        logger.info(f"Retention: removed {key} ({reason}, {entry['size'] / (1024 * 1024):.1f}MB)")
+        if self.on_evict is not None and not key.startswith((ORPHAN_PREFIX, UPLOAD_PREFIX)):
+            try:
+                self.on_evict(key)
+            except Exception as e:
+                logger.error(f"Retention: on_evict failed for {key}: {e}")
+
+    def _enforce_quota(self):
+        evicted = []
+        with self._cond:
+            for key in list(self._entries):
+                if self._bytes <= self.max_bytes:
+                    break
+                if self._entries[key]["busy"]:
+                    continue
+                evicted.append((key, self._pop_locked(key)))
+                self._evicted["quota"] += 1
+        for key, entry in evicted:
+            self._evict(key, entry, "disk quota")
+
+    def _expiry_loop(self):
+        while True:
+            expired = []
+            with self._cond:
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    expires_at, key = heapq.heappop(self._heap)
+                    entry = self._entries.get(key)
+                    # skip heap items of removed jobs or superseded expiry times
+                    if entry is None or entry["busy"] or entry["expires_at"] != expires_at:
+                        continue
+                    expired.append((key, self._pop_locked(key)))
+                    self._evicted["ttl"] += 1
+                if not expired:
+                    self._cond.wait(timeout=self._heap[0][0] - now if self._heap else None)
+            for key, entry in expired:
+                self._evict(key, entry, "expired")
+
+    def stats(self):
+        with self._cond:
+            return {
+                "tracked_jobs": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "evicted": dict(self._evicted)
+            }
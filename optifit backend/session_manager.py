@@ -0,0 +1,299 @@
+"""session_manager.py - Live-session state for pose_server
+
+Each session_id gets its own analyzer (rep count, stage) and a Pose graph
+leased from a bounded warm pool, so concurrent clients don't share tracking
+or squat state. Sessions are dropped after an idle timeout or, when the
+session limit is reached, least recently used first. When every graph is
+leased, the graph of the least recently used idle session is taken over;
+that session gets a fresh graph (and restarts tracking) on its next frame.
+
+Input is latest-frame-wins: while a session's frame is being inferred at
+most one newer frame waits, and a frame arriving after it replaces it.
+Dropped frames are counted per session, so feedback latency stays bounded
+when inference can't keep up.
+"""
+
+import collections
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from pose_utils import reset_pose
+
+logger = logging.getLogger(__name__)
+
+
+class LiveSession:
+    """One client's analyzer plus the Pose graph it currently holds (if any)."""
+
+    def __init__(self, session_id, analyzer):
+        self.session_id = session_id
+        self.analyzer = analyzer
+        self.pose = None
+        self.lock = threading.Lock()  # frames of one session are processed in order
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+        self.frames = 0
+        # latest-frame-wins input slot (see SessionManager.latest_frame)
+        self.slot = threading.Condition()
+        self.waiting = None
+        self.busy = False
+        self.dropped_frames = 0
+
+
+class LatestSlot:
+    """Single-item mailbox where a newer item replaces the one still waiting (latest-frame-wins)."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._full = False
+        self._closed = False
+
+    def put(self, item):
+        """Store item; returns True when it replaced (dropped) an item that was still waiting."""
+        with self._cond:
+            dropped = self._full
+            self._item, self._full = item, True
+            self._cond.notify()
+            return dropped
+
+    def get(self):
+        """Wait for the next item; None once the slot is closed and empty."""
+        with self._cond:
+            while not self._full and not self._closed:
+                self._cond.wait()
+            if not self._full:
+                return None
+            item, self._item, self._full = self._item, None, False
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class SessionManager:
+    """Maps session ids to LiveSessions with idle-timeout and LRU eviction."""
+
+    def __init__(self, analyzer_factory, pose_factory, max_sessions=256, max_pose_graphs=4,
+                 idle_timeout=300):
+        self.analyzer_factory = analyzer_factory
+        self.pose_factory = pose_factory
+        self.max_sessions = max(1, int(max_sessions))
+        self.max_pose_graphs = max(1, int(max_pose_graphs))
+        self.idle_timeout = idle_timeout
+        self._sessions = collections.OrderedDict()  # least recently used first
+        self._idle_poses = []
+        self._pose_count = 0
+        self._evicted = 0
+        self._cond = threading.Condition()
+
+    def warm_up(self, count=None):
+        """Build Pose graphs ahead of the first frames so new sessions don't pay for model loading."""
+        count = self.max_pose_graphs if count is None else min(count, self.max_pose_graphs)
+        while True:
+            with self._cond:
+                if self._pose_count >= count:
+                    return
+                self._pose_count += 1
+            pose = self.pose_factory()
+            with self._cond:
+                self._idle_poses.append(pose)
+                self._cond.notify_all()
+
+    @contextmanager
+    def session(self, session_id):
+        """Hold a session (creating it if needed) with a leased Pose graph while one frame is processed."""
+        while True:
+            session = self._get_or_create(session_id)
+            session.lock.acquire()
+            # it may have been evicted between lookup and locking
+            if self.get(session_id) is session:
+                break
+            session.lock.release()
+        try:
+            if session.pose is None:
+                session.pose = self._lease_pose(session)
+            yield session
+        finally:
+            session.frames += 1
+            session.last_seen = time.time()
+            session.lock.release()
+        with self._cond:
+            # the session is idle again, so its graph can be taken over by a waiting session
+            self._cond.notify_all()
+
+    @contextmanager
+    def latest_frame(self, session_id):
+        """
+        Like session(), for callers that each bring one frame (HTTP requests).
+        While the session is busy only the newest frame waits; a frame that is
+        replaced by a newer one is dropped and this yields None for it.
+        """
+        session = self._get_or_create(session_id)
+        ticket = object()
+        with session.slot:
+            if session.waiting is not None:
+                session.dropped_frames += 1
+            session.waiting = ticket
+            session.slot.notify_all()
+            while session.busy and session.waiting is ticket:
+                session.slot.wait()
+            admitted = session.waiting is ticket
+            if admitted:
+                session.waiting = None
+                session.busy = True
+
+        if not admitted:
+            yield None
+            return
+        try:
+            with self.session(session_id) as current:
+                yield current
+        finally:
+            with session.slot:
+                session.busy = False
+                session.slot.notify_all()
+
+    def add_dropped(self, session_id, count=1):
+        """Count frames dropped before they reached the session (e.g. by a stream's LatestSlot)."""
+        session = self.get(session_id)
+        if session is not None:
+            with session.slot:
+                session.dropped_frames += count
+
+    def _get_or_create(self, session_id):
+        with self._cond:
+            self._prune_locked()
+            session = self._sessions.get(session_id)
+            if session is None:
+                while len(self._sessions) >= self.max_sessions and self._evict_lru_locked():
+                    pass
+                session = LiveSession(session_id, self.analyzer_factory())
+                self._sessions[session_id] = session
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_seen = time.time()
+            return session
+
+    def _lease_pose(self, session):
+        with self._cond:
+            while True:
+                if self._idle_poses:
+                    pose = self._idle_poses.pop()
+                    break
+                if self._pose_count < self.max_pose_graphs:
+                    self._pose_count += 1
+                    pose = None
+                    break
+                pose = self._take_over_locked(session)
+                if pose is not None:
+                    break
+                self._cond.wait(timeout=1.0)
+
+        if pose is None:
+            try:
+                return self.pose_factory()
+            except Exception:
+                with self._cond:
+                    self._pose_count -= 1
+                    self._cond.notify_all()
+                raise
+        # the graph may carry another session's tracking state
+        reset_pose(pose)
+        return pose
+
+    def _take_over_locked(self, requester):
+        """Take the graph of the least recently used session that isn't processing a frame."""
+        for session in self._sessions.values():
+            if session is requester or session.pose is None:
+                continue
+            if not session.lock.acquire(blocking=False):
+                continue
+            try:
+                pose, session.pose = session.pose, None
+                return pose
+            finally:
+                session.lock.release()
+        return None
+
+    def _release_locked(self, session):
+        if session.pose is not None:
+            self._idle_poses.append(session.pose)
+            session.pose = None
+            self._cond.notify_all()
+
+    def _drop_locked(self, session):
+        """Remove an idle session; returns False when it is processing a frame."""
+        if not session.lock.acquire(blocking=False):
+            return False
+        try:
+            del self._sessions[session.session_id]
+            self._release_locked(session)
+        finally:
+            session.lock.release()
+        return True
+
+    def _evict_lru_locked(self):
+        for session in list(self._sessions.values()):
+            if self._drop_locked(session):
+                self._evicted += 1
+                logger.info(f"Evicted live session {session.session_id} (session limit)")
+                return True
+        return False
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.idle_timeout
+        for session in list(self._sessions.values()):
+            if session.last_seen >= cutoff:
+                break
+            if self._drop_locked(session):
+                self._evicted += 1
+                logger.info(f"Expired idle live session {session.session_id}")
+
+    def prune(self):
+        """Drop sessions idle for longer than idle_timeout."""
+        with self._cond:
+            self._prune_locked()
+
+    def reset(self, session_id):
+        """Start a session over: new analyzer state and fresh tracking."""
+        session = self._get_or_create(session_id)
+        with session.lock:
+            session.analyzer = self.analyzer_factory()
+            session.frames = 0
+            session.dropped_frames = 0
+            if session.pose is not None:
+                reset_pose(session.pose)
+        return session
+
+    def end(self, session_id):
+        """Drop a session and return its graph to the pool; False when it doesn't exist."""
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+        with session.lock:
+            with self._cond:
+                if self._sessions.get(session_id) is session:
+                    del self._sessions[session_id]
+                self._release_locked(session)
+        return True
+
+    def get(self, session_id):
+        with self._cond:
+            return self._sessions.get(session_id)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'active_sessions': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'pose_graphs': self._pose_count,
+                'idle_pose_graphs': len(self._idle_poses),
+                'max_pose_graphs': self.max_pose_graphs,
+                'idle_timeout_seconds': self.idle_timeout,
+                'evicted_sessions': self._evicted
+            }
@@ -0,0 +1,107 @@
+"""telemetry.py - Compact per-frame analysis telemetry
+
+The per-frame columns of a job's analysis (angles, stage, alignment, rep
+count, form flags, feedback) are stored once at the end of the job as
+typed arrays in an .npz next to the processed video: floats as float32,
+counts as int32, flags as bool and text columns as int8 codes into a small
+vocabulary. CSV is produced from that file only when it is requested
+(GET /result/<job_id>/telemetry.csv).
+"""
+
+import csv
+import io
+import os
+import numpy as np
+
+# Set TELEMETRY_COMPRESS=false to trade file size for a faster write
+TELEMETRY_COMPRESS = os.environ.get('TELEMETRY_COMPRESS', 'true').lower() in ('1', 'true', 'yes')
+
+_LABELS_PREFIX = "labels_"
+_COLUMN_PREFIX = "col_"
+
+
+def telemetry_path_for(output_path):
+    """Where the telemetry for a processed video is stored"""
+    return os.path.splitext(output_path)[0] + '_telemetry.npz'
+
+
+def _pack_column(values):
+    """Typed array for one column, plus the vocabulary when it is a text column."""
+    values = np.asarray(values)
+    if values.dtype == bool:
+        return values, None
+    if values.dtype.kind in "iu":
+        return values.astype(np.int32, copy=False), None
+    if values.dtype.kind == "f":
+        return values.astype(np.float32, copy=False), None
+    # text (None = missing): codes into the column's vocabulary, -1 for None
+    labels = sorted({value for value in values.tolist() if value is not None})
+    index = {label: code for code, label in enumerate(labels)}
+    codes = np.array([index.get(value, -1) for value in values.tolist()],
+                     dtype=np.int8 if len(labels) < 128 else np.int32)
+    return codes, np.array(labels, dtype=str)
+
+
+def save_telemetry(path, timestamps, analyzed, columns, compress=TELEMETRY_COMPRESS, **meta):
+    """Write one job's per-frame columns (rep_engine column arrays) in a single file."""
+    arrays = {"timestamps": timestamps, "analyzed": analyzed}
+    for name, values in columns.items():
+        packed, labels = _pack_column(values)
+        arrays[f"{_COLUMN_PREFIX}{name}"] = packed
+        if labels is not None:
+            arrays[f"{_LABELS_PREFIX}{name}"] = labels
+    for key, value in meta.items():
+        arrays[f"meta_{key}"] = np.array(value)
+    (np.savez_compressed if compress else np.savez)(path, **arrays)
+    return path
+
+
+def load_telemetry(path):
+    """Load a telemetry file: timestamps, analyzed, columns (text columns decoded, None where missing) and meta."""
+    with np.load(path) as data:
+        columns = {}
+        for key in data.files:
+            if not key.startswith(_COLUMN_PREFIX):
+                continue
+            name = key[len(_COLUMN_PREFIX):]
+            values = data[key]
+            if f"{_LABELS_PREFIX}{name}" in data.files:
+                labels = np.array(data[f"{_LABELS_PREFIX}{name}"].tolist() + [None], dtype=object)
+                values = labels[values]  # code -1 picks the trailing None
+            columns[name] = values
+        return {
+            "timestamps": data["timestamps"],
+            "analyzed": data["analyzed"],
+            "columns": columns,
+            "meta": {key[5:]: data[key].item() for key in data.files if key.startswith("meta_")}
+        }
+
+
+def _format(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return "" if value != value else f"{value:.2f}"
+    return value
+
+
+def iter_csv(path, rows_per_chunk=500):
+    """CSV export of a telemetry file (analyzed frames only), yielded in text chunks for a streamed response."""
+    data = load_telemetry(path)
+    names = list(data["columns"])
+    lists = [data["columns"][name].tolist() for name in names]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["frame", "timestamp"] + names)
+
+    rows = 0
+    for frame, (timestamp, was_analyzed) in enumerate(zip(data["timestamps"].tolist(), data["analyzed"].tolist())):
+        if not was_analyzed:
+            continue
+        writer.writerow([frame, f"{timestamp:.3f}"] + [_format(values[frame]) for values in lists])
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
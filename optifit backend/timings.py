@@ -0,0 +1,108 @@
+"""timings.py - Per-stage timing of video jobs
+
+JobTimings records wall time, CPU time (of the thread doing the work) and
+frame counts for each stage of one job: the pipeline stages of the
+inference and render passes, landmark storage, the rep analysis and CSV
+logging. TimingAggregator sums them across jobs.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _fps(frames, seconds):
+    return round(frames / seconds, 1) if frames and seconds else None
+
+
+class JobTimings:
+    """Wall/CPU seconds and frame counts per named stage of one job."""
+
+    def __init__(self):
+        self.stages = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, frames=None):
+        """Time the block as stage `name` (CPU time is the current thread's)."""
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start, frames)
+
+    def record(self, name, wall_s, cpu_s=None, frames=None):
+        stage = self.stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "frames": 0})
+        stage["wall_s"] += wall_s
+        stage["cpu_s"] += cpu_s or 0.0
+        stage["frames"] += frames or 0
+
+    def add_pipeline(self, prefix, stats):
+        """Add run_pipeline stats (or segmented stats) as `prefix.<stage>` entries plus a `prefix` total."""
+        parts = stats.get("segments", [stats])
+        for part in parts:
+            for name, stage in part.items():
+                if name != "wall_s":
+                    self.record(f"{prefix}.{name}", stage["busy_s"], stage.get("cpu_s"), stage["frames"])
+        # every pipeline is fed by a "decode" source, so its frame count is the pass's frame count
+        frames = sum(part.get("decode", {}).get("frames", 0) for part in parts)
+        self.record(prefix, stats["wall_s"], None, frames)
+
+    def as_dict(self):
+        return {
+            "stages": {
+                name: {
+                    "wall_s": round(stage["wall_s"], 3),
+                    "cpu_s": round(stage["cpu_s"], 3),
+                    "frames": stage["frames"],
+                    "fps": _fps(stage["frames"], stage["wall_s"])
+                }
+                for name, stage in self.stages.items()
+            },
+            "total_wall_s": round(time.perf_counter() - self._started, 3)
+        }
+
+
+class TimingAggregator:
+    """Running totals of job timings per stage, across jobs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = 0
+        self._stages = {}
+        self._totals = {}  # job-level key -> [sum, jobs that reported it]
+
+    def add(self, timings):
+        """Add one job's timings block (as attached to /result)."""
+        with self._lock:
+            self._jobs += 1
+            for name, stage in timings.get("stages", {}).items():
+                total = self._stages.setdefault(name, {"jobs": 0, "wall_s": 0.0, "cpu_s": 0.0, "frames": 0})
+                total["jobs"] += 1
+                total["wall_s"] += stage["wall_s"]
+                total["cpu_s"] += stage["cpu_s"]
+                total["frames"] += stage["frames"]
+            for key in ("queue_wait_s", "job_wall_s", "total_wall_s"):
+                if timings.get(key) is not None:
+                    total = self._totals.setdefault(key, [0.0, 0])
+                    total[0] += timings[key]
+                    total[1] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "jobs": self._jobs,
+                "stages": {
+                    name: {
+                        "jobs": total["jobs"],
+                        "wall_s": round(total["wall_s"], 3),
+                        "mean_wall_s": round(total["wall_s"] / total["jobs"], 3),
+                        "cpu_s": round(total["cpu_s"], 3),
+                        "frames": total["frames"],
+                        "fps": _fps(total["frames"], total["wall_s"])
+                    }
+                    for name, total in self._stages.items()
+                },
+                # averaged over the jobs that reported each value, like mean_wall_s of a stage
+                "mean": {key: round(value / jobs, 3) for key, (value, jobs) in self._totals.items()}
+            }
@@ -0,0 +1,340 @@
+"""uploads.py - Streaming ingestion of uploaded videos
+
+Werkzeug normally spools a multipart file part into a temporary file that
+the view then copies into uploads/. Here the form parser writes the part
+straight into the upload folder chunk by chunk, hashing it on the way and
+aborting as soon as the size limit is exceeded, so each upload is written
+to disk once and memory per connection stays bounded.
+
+Large clips can also be sent as numbered chunks through a resumable upload
+session (ChunkedUploadStore).
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from retention import UPLOAD_PREFIX
+
+
+class IngestFile:
+    """Upload target that hashes and counts bytes as the form parser streams them in."""
+
+    def __init__(self, directory, max_bytes):
+        self.path = os.path.join(directory, f".incoming_{uuid.uuid4().hex}")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._committed = False
+        self._file = open(self.path, 'wb+')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(
+                f"File size exceeds maximum allowed size ({self.max_bytes / (1024*1024):.1f}MB)"
+            )
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def commit(self, path):
+        """Move the finished upload to its final path (a rename, not a copy); returns the sha256 hex digest"""
+        self._file.close()
+        os.replace(self.path, path)
+        self.path = path
+        self._committed = True
+        return self.hexdigest()
+
+    def discard(self):
+        self._file.close()
+        if not self._committed:
+            _remove_quietly(self.path)
+
+    def close(self):
+        # Called when the request is torn down: uploads the view never committed are removed
+        self.discard()
+
+    def __getattr__(self, name):
+        # read/seek/tell/... go to the underlying file
+        return getattr(self._file, name)
+
+
+def streaming_request_class(upload_folder, max_bytes):
+    """Flask request class whose file parts are streamed into upload_folder, capped at max_bytes each."""
+
+    class StreamingUploadRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            return IngestFile(upload_folder, max_bytes)
+
+    return StreamingUploadRequest
+
+
+def upload_size(video):
+    """Size of an ingested upload, or None when it wasn't streamed through IngestFile"""
+    return video.stream.size if isinstance(video.stream, IngestFile) else None
+
+
+def commit_upload(video, path, chunk_size=1024 * 1024):
+    """Put the uploaded file at path and return its sha256 hex digest"""
+    if isinstance(video.stream, IngestFile):
+        return video.stream.commit(path)
+    # Fallback for uploads parsed by the default request class: copy while hashing
+    digest = hashlib.sha256()
+    with open(path, 'wb') as f:
+        while True:
+            chunk = video.stream.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+# Resumable chunked uploads
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadSessionError(Exception):
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ChunkedUploadStore:
+    """
+    Resumable upload sessions. Each session owns one file in the upload folder
+    and every numbered chunk is written at its offset in that file, so a client
+    that lost its connection only resends the chunks that are missing.
+    The content hash follows the contiguous prefix of received chunks, so
+    in-order uploads are hashed as they arrive.
+    With a RetentionManager, each session file is tracked in it: it counts
+    against the disk quota and is removed once no chunk arrived for
+    ttl_seconds, even if no other session is ever created.
+    """
+
+    def __init__(self, upload_folder, max_bytes, ttl_seconds=7200, retention=None):
+        self.upload_folder = upload_folder
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.retention = retention
+        self._sessions = {}
+        # upload_id -> completion record ({"lock", "job_id", "updated_at"}); outlives the
+        # session by ttl_seconds so a repeated /complete still finds the job
+        self._completions = {}
+        self._lock = threading.Lock()
+
+    def create(self, filename, total_size, chunk_size=DEFAULT_CHUNK_SIZE, **meta):
+        """Open a session for a file of total_size bytes; meta (exercise type, ...) is reported with its status"""
+        if total_size <= 0:
+            raise UploadSessionError("Video file is empty")
+        if total_size > self.max_bytes:
+            raise UploadSessionError(
+                f"File size ({total_size / (1024*1024):.1f}MB) exceeds maximum "
+                f"allowed size ({self.max_bytes / (1024*1024):.1f}MB)", 413)
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadSessionError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes")
+
+        self._prune()
+        upload_id = str(uuid.uuid4())
+        path = os.path.join(self.upload_folder, f".chunked_{upload_id}")
+        open(path, 'wb').close()
+        session = {
+            "upload_id": upload_id,
+            "filename": filename,
+            "path": path,
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "total_chunks": -(-total_size // chunk_size),
+            "received": set(),
+            "digest": hashlib.sha256(),
+            "hashed_chunks": 0,
+            "meta": meta,
+            "updated_at": time.time(),
+            "lock": threading.Lock()
+        }
+        with self._lock:
+            self._sessions[upload_id] = session
+            self._completions[upload_id] = {"lock": threading.Lock(), "job_id": None, "updated_at": time.time()}
+        self._track(session)
+        return self._describe(session)
+
+    def _track(self, session):
+        """(Re)start the session file's idle TTL in retention and update its size there"""
+        if self.retention is not None:
+            self.retention.finish(UPLOAD_PREFIX + session["upload_id"], [session["path"]], self.ttl_seconds)
+
+    def _untrack(self, upload_id):
+        if self.retention is not None:
+            self.retention.forget(UPLOAD_PREFIX + upload_id)
+
+    def _get(self, upload_id):
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is None or not os.path.exists(session["path"]):
+            raise UploadSessionError("Upload session not found", 404)
+        return session
+
+    def _prune(self):
+        """Drop sessions that haven't received a chunk within the TTL, or whose file retention removed"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [s for s in self._sessions.values()
+                       if s["updated_at"] < cutoff or not os.path.exists(s["path"])]
+            for session in expired:
+                del self._sessions[session["upload_id"]]
+            for upload_id in [upload_id for upload_id, record in self._completions.items()
+                              if upload_id not in self._sessions and record["updated_at"] < cutoff]:
+                del self._completions[upload_id]
+        for session in expired:
+            self._untrack(session["upload_id"])
+            _remove_quietly(session["path"])
+
+    def _chunk_length(self, session, index):
+        return min(session["chunk_size"], session["total_size"] - index * session["chunk_size"])
+
+    def _describe(self, session):
+        received = session["received"]
+        missing = [i for i in range(session["total_chunks"]) if i not in received]
+        return {
+            "upload_id": session["upload_id"],
+            "filename": session["filename"],
+            "total_size": session["total_size"],
+            "chunk_size": session["chunk_size"],
+            "total_chunks": session["total_chunks"],
+            "received_chunks": sorted(received),
+            "missing_chunks": missing,
+            "bytes_received": sum(self._chunk_length(session, i) for i in received),
+            "complete": not missing,
+            **session["meta"]
+        }
+
+    def status(self, upload_id):
+        session = self._get(upload_id)
+        with session["lock"]:
+            return self._describe(session)
+
+    def write_chunk(self, upload_id, index, stream, offset=None):
+        """Write chunk `index` from stream at its offset; resending a received chunk is a no-op"""
+        session = self._get(upload_id)
+        if not 0 <= index < session["total_chunks"]:
+            raise UploadSessionError(f"Chunk index must be between 0 and {session['total_chunks'] - 1}")
+        start = index * session["chunk_size"]
+        if offset is not None and offset != start:
+            raise UploadSessionError(f"Chunk {index} starts at offset {start}, not {offset}")
+        expected = self._chunk_length(session, index)
+
+        with session["lock"]:
+            if index in session["received"]:
+                _drain(stream)
+                return self._describe(session)
+
+            # Chunk that extends the hashed prefix is hashed while it is written
+            extends_prefix = index == session["hashed_chunks"]
+            chunk_digest = session["digest"].copy() if extends_prefix else None
+            written = 0
+            with open(session["path"], 'r+b') as f:
+                f.seek(start)
+                while True:
+                    data = stream.read(min(COPY_BUFFER_SIZE, expected + 1 - written))
+                    if not data:
+                        break
+                    written += len(data)
+                    if written > expected:
+                        _drain(stream)
+                        raise UploadSessionError(f"Chunk {index} must be exactly {expected} bytes")
+                    if chunk_digest is not None:
+                        chunk_digest.update(data)
+                    f.write(data)
+            if written != expected:
+                raise UploadSessionError(f"Chunk {index} must be exactly {expected} bytes, got {written}")
+
+            session["received"].add(index)
+            session["updated_at"] = time.time()
+            self._track(session)
+            if chunk_digest is not None:
+                session["digest"] = chunk_digest
+                session["hashed_chunks"] += 1
+            self._advance_hash(session)
+            return self._describe(session)
+
+    def _advance_hash(self, session):
+        """Hash chunks that arrived out of order once the gap before them is filled"""
+        if session["hashed_chunks"] not in session["received"]:
+            return
+        with open(session["path"], 'rb') as f:
+            while session["hashed_chunks"] in session["received"]:
+                index = session["hashed_chunks"]
+                f.seek(index * session["chunk_size"])
+                remaining = self._chunk_length(session, index)
+                while remaining > 0:
+                    data = f.read(min(COPY_BUFFER_SIZE, remaining))
+                    if not data:
+                        break
+                    session["digest"].update(data)
+                    remaining -= len(data)
+                session["hashed_chunks"] += 1
+
+    def finalize(self, upload_id, path):
+        """Move a complete upload to path and close the session; returns its sha256 hex digest"""
+        session = self._get(upload_id)
+        with session["lock"]:
+            missing = session["total_chunks"] - len(session["received"])
+            if missing:
+                raise UploadSessionError(f"Upload is missing {missing} chunk(s)", 409)
+            self._advance_hash(session)
+            with self._lock:
+                self._sessions.pop(upload_id, None)
+            os.replace(session["path"], path)
+            self._untrack(upload_id)  # the upload now belongs to its job
+            return session["digest"].hexdigest()
+
+    @contextmanager
+    def completion(self, upload_id):
+        """
+        Hold the completion lock of an upload, so concurrent /complete calls for it run
+        one at a time. Yields its completion record: the first caller turns the upload
+        into a job and sets record["job_id"]; later callers find that job there.
+        """
+        with self._lock:
+            record = self._completions.get(upload_id)
+        if record is None:
+            raise UploadSessionError("Upload session not found", 404)
+        with record["lock"]:
+            yield record
+            record["updated_at"] = time.time()
+
+    def discard(self, upload_id):
+        session = self._get(upload_id)
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+            self._completions.pop(upload_id, None)
+        self._untrack(upload_id)
+        _remove_quietly(session["path"])
+
+    def active(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+def _drain(stream):
+    while stream.read(COPY_BUFFER_SIZE):
+        pass
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
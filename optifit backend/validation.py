@@ -61,11 +61,12 @@ def validate_upload_request(request):
 
 
 # Validates the video file iteslf in terms of file size, extensions and filename
-def validate_video_file(file):
-    # Calculating the file size 
-    file.seek(0, 2)  # Seek to end
-    file_size = file.tell()
-    file.seek(0)     
+def validate_video_file(file, file_size=None):
+    # Streamed uploads already know their size; otherwise measure it
+    if file_size is None:
+        file.seek(0, 2)  # Seek to end
+        file_size = file.tell()
+        file.seek(0)     
     
     #Checks if the file size is within limits
     if file_size == 0:
@@ -0,0 +1,255 @@
+"""video_encoder.py - Single-pass H.264 encoder stage
+
+Streams annotated BGR frames straight into one ffmpeg subprocess over
+stdin (rawvideo -> libx264), so encoding overlaps with analysis and no
+intermediate mp4v file is written and decoded again.
+
+Finished files are written with +faststart (moov atom first), so players
+can start playback and seek with range requests before the whole file is
+downloaded.
+
+Every output (MP4 or HLS directory) is written under a hidden partial name
+next to its final path and moved into place with os.replace once ffmpeg
+succeeded, so /processed never serves a file that is still being encoded.
+
+The same ffmpeg process can also encode an HLS ladder (one rendition per
+target height, e.g. 360p and 720p) from the frames it receives, so clients
+on slow connections can stream a lower bitrate.
+"""
+
+import os
+import shutil
+import subprocess
+import numpy as np
+
+# HLS output: master playlist name, segment length, and target video bitrate (kbit/s) per rendition (short side)
+HLS_MASTER_PLAYLIST = 'master.m3u8'
+HLS_SEGMENT_SECONDS = 4
+HLS_BITRATES = {240: 400, 360: 800, 480: 1400, 720: 2800, 1080: 5000}
+
+
+def hls_dir_for(output_path):
+    """Directory holding the HLS playlists and segments of a processed video"""
+    return os.path.splitext(output_path)[0] + '_hls'
+
+
+def partial_path(path):
+    """Hidden name a file or directory is written under until it is complete"""
+    head, tail = os.path.split(path)
+    return os.path.join(head, '.' + tail)
+
+
+def _commit_partial(path):
+    """Move a completed partial file or directory into place, replacing an older one"""
+    partial = partial_path(path)
+    if os.path.isdir(partial):
+        shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial, path)
+
+
+def _discard_partial(path):
+    partial = partial_path(path)
+    if os.path.isdir(partial):
+        shutil.rmtree(partial, ignore_errors=True)
+    elif os.path.exists(partial):
+        os.remove(partial)
+
+
+def hls_ladder(renditions, frame_size):
+    """
+    Rendition sizes (short side, as in "360p") no larger than the source; the
+    source size itself when every rendition is larger.
+    """
+    short_side = min(frame_size)
+    ladder = sorted({int(h) // 2 * 2 for h in renditions if 0 < int(h) <= short_side})
+    return ladder or [short_side // 2 * 2]
+
+
+def _rendition_bitrate(size):
+    if size in HLS_BITRATES:
+        return HLS_BITRATES[size]
+    # roughly proportional to pixel count, relative to 720p
+    return max(300, int(HLS_BITRATES[720] * (size / 720) ** 2))
+
+
+def _hls_args(hls_dir, renditions, preset):
+    """ffmpeg output options for an HLS ladder fed by filter outputs [hls0], [hls1], ..."""
+    args = []
+    for index, size in enumerate(renditions):
+        kbps = _rendition_bitrate(size)
+        args += ['-map', f'[hls{index}]',
+                 f'-b:v:{index}', f'{kbps}k', f'-maxrate:v:{index}', f'{int(kbps * 1.07)}k',
+                 f'-bufsize:v:{index}', f'{int(kbps * 1.5)}k']
+    return args + [
+        '-an',
+        '-vcodec', 'libx264',
+        '-preset', preset,
+        '-pix_fmt', 'yuv420p',
+        # keyframes on segment boundaries so every rendition switches at the same points
+        '-force_key_frames', f'expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})',
+        '-sc_threshold', '0',
+        '-f', 'hls',
+        '-hls_time', str(HLS_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(hls_dir, 'stream_%v_%03d.ts'),
+        '-master_pl_name', HLS_MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(f'v:{index}' for index in range(len(renditions))),
+        os.path.join(hls_dir, 'stream_%v.m3u8')
+    ]
+
+
+def _hls_filters(source, renditions, frame_size):
+    """filter_complex chains that scale `source` to each rendition size as [hls0], [hls1], ..."""
+    width, height = frame_size
+    # the rendition size applies to the short side, so portrait videos keep their resolution
+    scale = "{}:-2" if width < height else "-2:{}"
+    return [f"[{source}{index}]scale={scale.format(size)}[hls{index}]" for index, size in enumerate(renditions)]
+
+
+def _prepare_hls_dir(hls_dir):
+    """Empty partial directory for a ladder; returns its path (a re-render replaces the previous ladder on commit)"""
+    partial = partial_path(hls_dir)
+    shutil.rmtree(partial, ignore_errors=True)
+    os.makedirs(partial)
+    return partial
+
+
+class FFmpegWriter:
+    """
+    Drop-in replacement for cv2.VideoWriter that encodes H.264 via an ffmpeg pipe.
+    With hls_dir and hls_renditions, the same process also writes an HLS ladder there.
+    Outputs appear at their paths only after a successful release(); abort() drops them.
+    """
+
+    def __init__(self, output_path, fps, frame_size, preset='fast', crf=23, faststart=True,
+                 hls_dir=None, hls_renditions=()):
+        width, height = frame_size
+        self.output_path = output_path
+        self.frame_size = (width, height)
+        self.hls_dir = hls_dir if hls_dir and hls_renditions else None
+        # libx264 + yuv420p needs even dimensions
+        even_scale = 'scale=trunc(iw/2)*2:trunc(ih/2)*2'
+        if self.hls_dir:
+            partial_hls_dir = _prepare_hls_dir(hls_dir)
+            splits = "".join(f"[split{i}]" for i in range(len(hls_renditions)))
+            filters = [f"[0:v]split={len(hls_renditions) + 1}[main]{splits}",
+                       f"[main]{even_scale}[out]"] + _hls_filters("split", hls_renditions, frame_size)
+            video_args = ['-filter_complex', ';'.join(filters), '-map', '[out]']
+            hls_args = _hls_args(partial_hls_dir, hls_renditions, preset)
+        else:
+            video_args = ['-vf', even_scale]
+            hls_args = []
+        self.cmd = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo',
+            '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}',
+            '-r', str(fps),
+            '-i', '-',
+            *video_args,
+            '-an',
+            '-vcodec', 'libx264',
+            '-preset', preset,
+            '-crf', str(crf),
+            '-pix_fmt', 'yuv420p',
+            # faststart rewrites the file once at the end; skip it for intermediate parts
+            *(['-movflags', '+faststart'] if faststart else []),
+            partial_path(output_path),
+            *hls_args
+        ]
+        self._proc = subprocess.Popen(self.cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._broken = False
+        self._closed = False
+
+    def write(self, frame):
+        """Send one BGR frame (height x width x 3, uint8) to the encoder."""
+        if self._broken:
+            return
+        try:
+            self._proc.stdin.write(np.ascontiguousarray(frame).data)
+        except BrokenPipeError:
+            # ffmpeg exited early; the error is reported by release()
+            self._broken = True
+
+    def release(self):
+        """
+        Flush the pipe, wait for ffmpeg and move the outputs into place; raises
+        CalledProcessError if encoding failed. No-op after abort().
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self._proc.stderr.read()
+        self._proc.stderr.close()
+        returncode = self._proc.wait()
+        if returncode != 0:
+            self._discard()
+            raise subprocess.CalledProcessError(returncode, self.cmd, stderr=stderr)
+        _commit_partial(self.output_path)
+        if self.hls_dir:
+            _commit_partial(self.hls_dir)
+
+    def abort(self):
+        """Stop ffmpeg and drop the partial outputs (the stream didn't finish)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._proc.kill()
+        for pipe in (self._proc.stdin, self._proc.stderr):
+            try:
+                pipe.close()
+            except BrokenPipeError:
+                pass
+        self._proc.wait()
+        self._discard()
+
+    def _discard(self):
+        _discard_partial(self.output_path)
+        if self.hls_dir:
+            _discard_partial(self.hls_dir)
+
+
+def concat_videos(part_paths, output_path):
+    """
+    Join segments encoded by FFmpegWriter with identical settings into one file.
+    Uses the concat demuxer with stream copy, so nothing is re-encoded.
+    """
+    list_path = output_path + '.parts.txt'
+    with open(list_path, 'w') as f:
+        for part_path in part_paths:
+            f.write(f"file '{os.path.abspath(part_path)}'\n")
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+           '-c', 'copy', '-movflags', '+faststart', partial_path(output_path)]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError:
+        _discard_partial(output_path)
+        raise
+    finally:
+        os.remove(list_path)
+    _commit_partial(output_path)
+    return output_path
+
+
+def package_hls(source_path, hls_dir, renditions, frame_size, preset='fast'):
+    """
+    Encode an HLS ladder from a finished video in one ffmpeg run (used for videos
+    rendered as parallel segments, whose writers don't see the whole stream).
+    """
+    partial_hls_dir = _prepare_hls_dir(hls_dir)
+    filters = [f"[0:v]split={len(renditions)}" + "".join(f"[split{i}]" for i in range(len(renditions)))]
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-i', source_path,
+           '-filter_complex', ';'.join(filters + _hls_filters("split", renditions, frame_size)),
+           *_hls_args(partial_hls_dir, renditions, preset)]
+    try:
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError:
+        _discard_partial(hls_dir)
+        raise
+    _commit_partial(hls_dir)
+    return os.path.join(hls_dir, HLS_MASTER_PLAYLIST)
@@ -0,0 +1,477 @@
+"""video_pipeline.py - Inference and render passes shared by the exercise counters
+
+A rendered job runs one pass (decode -> MediaPipe -> analyze + draw ->
+H.264 encode): a causal frame analyzer from the counter turns each inferred
+frame into its overlay record, so every frame is decoded once and encoded
+right after its inference. The vectorized whole-array analysis in the
+counters then produces the stats from the collected landmarks.
+
+Analysis-only jobs run just the inference pass (decode -> MediaPipe ->
+landmark array), and can be rendered later by the render pass (decode ->
+overlay -> H.264 encode), which draws from the stored analysis results.
+
+Each pass is a pipeline of stages on their own threads connected by
+bounded queues, so decoding runs ahead of inference and drawing overlaps
+encoding. OpenCV, MediaPipe and the ffmpeg pipe release the GIL while
+they work. Every stage reports its frame count and busy time.
+
+Long videos are also split into contiguous segments that run in parallel,
+each with its own Pose graph, as separate inference and render passes
+(a frame's overlay depends on every frame before it, so a single pass can't
+be split). Inference segments start a little early
+(SEGMENT_OVERLAP_SECONDS) so tracking has settled by the segment's first
+frame, and their landmarks are concatenated before the rep analysis runs
+once over the whole video, so reps across a boundary are counted exactly
+as in a single pass. Rendered segments are joined without re-encoding.
+
+With HLS_RENDITIONS set, the render pass also writes an HLS ladder next to
+the MP4 (see video_encoder.hls_dir_for).
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+from pose_utils import (create_pose, reset_pose, prepare_inference_frame, resize_max_side,
+                        scaled_size, INFERENCE_MAX_SIDE, OUTPUT_MAX_SIDE)
+from video_encoder import FFmpegWriter, concat_videos, hls_dir_for, hls_ladder, package_hls
+from landmark_store import NUM_LANDMARKS, landmarks_to_array, array_to_landmarks
+
+logger = logging.getLogger(__name__)
+
+_NO_POSE = np.full((NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+
+# Frames buffered between two pipeline stages
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 8))
+# Videos at least SEGMENT_MIN_SECONDS long are split into SEGMENT_WORKERS parallel segments
+SEGMENT_WORKERS = int(os.environ.get('SEGMENT_WORKERS', 2))
+SEGMENT_MIN_SECONDS = float(os.environ.get('SEGMENT_MIN_SECONDS', 60))
+# Frames decoded before each inference segment (and discarded) so Pose tracking has settled
+SEGMENT_OVERLAP_SECONDS = float(os.environ.get('SEGMENT_OVERLAP_SECONDS', 1.0))
+# Rendition sizes (short side in pixels, e.g. "360,720") of the HLS output; empty = MP4 only
+HLS_RENDITIONS = [int(size) for size in os.environ.get('HLS_RENDITIONS', '').split(',') if size.strip()]
+
+_END = object()
+
+# Idle Pose graphs of this process, lent to the extra segments of long videos (and to jobs that
+# don't bring a graph of their own) and kept warm between jobs
+_idle_poses = []
+_idle_poses_lock = threading.Lock()
+
+
+def _lease_pose():
+    """An idle Pose graph reset for a new video, or a new graph when none is idle."""
+    with _idle_poses_lock:
+        pose = _idle_poses.pop() if _idle_poses else None
+    if pose is None:
+        return create_pose()
+    reset_pose(pose)
+    return pose
+
+
+def _release_pose(pose):
+    with _idle_poses_lock:
+        _idle_poses.append(pose)
+
+
+def run_pipeline(source_name, source, stages, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Run `source` (an iterable) and each (name, func) stage on its own thread,
+    connected by bounded queues; func(item) returns the item for the next stage.
+    The first error in any stage stops the pipeline and is re-raised here.
+
+    Returns per-stage stats: frames, busy seconds, CPU seconds of the stage's
+    thread and fps (frames per busy second, i.e. the rate the stage could
+    sustain alone), plus wall time.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    names = [source_name] + [name for name, _ in stages]
+    stats = {name: {"frames": 0, "busy_s": 0.0, "cpu_s": 0.0} for name in names}
+    errors = []
+    stop = threading.Event()
+
+    def put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(q):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def produce():
+        stage_stats = stats[source_name]
+        items = iter(source)
+        try:
+            while not stop.is_set():
+                start, cpu_start = time.perf_counter(), time.thread_time()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                stage_stats["busy_s"] += time.perf_counter() - start
+                stage_stats["cpu_s"] += time.thread_time() - cpu_start
+                stage_stats["frames"] += 1
+                if not put(queues[0], item):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            return
+        put(queues[0], _END)
+
+    def work(index, name, func):
+        stage_stats = stats[name]
+        out = queues[index + 1] if index + 1 < len(queues) else None
+        try:
+            while True:
+                item = get(queues[index])
+                if item is _END:
+                    break
+                start, cpu_start = time.perf_counter(), time.thread_time()
+                result = func(item)
+                stage_stats["busy_s"] += time.perf_counter() - start
+                stage_stats["cpu_s"] += time.thread_time() - cpu_start
+                stage_stats["frames"] += 1
+                if out is not None and not put(out, result):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+            return
+        if out is not None:
+            put(out, _END)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=produce, name=f"pipeline-{source_name}", daemon=True)]
+    threads += [threading.Thread(target=work, args=(index, name, func), name=f"pipeline-{name}", daemon=True)
+                for index, (name, func) in enumerate(stages)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    for stage_stats in stats.values():
+        stage_stats["fps"] = round(stage_stats["frames"] / stage_stats["busy_s"], 1) if stage_stats["busy_s"] else None
+        stage_stats["busy_s"] = round(stage_stats["busy_s"], 3)
+        stage_stats["cpu_s"] = round(stage_stats["cpu_s"], 3)
+    stats["wall_s"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def _read_frames(cap, count=None):
+    read = 0
+    while cap.isOpened() and (count is None or read < count):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        read += 1
+        yield frame
+
+
+def _open_video(input_path, start_frame=0):
+    cap = cv2.VideoCapture(input_path)
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    return cap
+
+
+def video_info(input_path):
+    """fps, frame count and (width, height) from the container metadata."""
+    cap = cv2.VideoCapture(input_path)
+    try:
+        fps = int(cap.get(cv2.CAP_PROP_FPS)) or 20
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    finally:
+        cap.release()
+    return fps, frame_count, size
+
+
+def plan_segments(frame_count, fps, workers=SEGMENT_WORKERS, min_seconds=SEGMENT_MIN_SECONDS):
+    """
+    Split [0, frame_count) into up to `workers` contiguous (start, end) frame ranges;
+    short videos get a single range. The last range ends at None (end of stream),
+    since container frame counts are not always exact.
+    """
+    if workers <= 1 or frame_count <= 0 or frame_count < min_seconds * fps:
+        return [(0, None)]
+    size = -(-frame_count // workers)
+    starts = list(range(0, frame_count, size))
+    return [(start, starts[i + 1] if i + 1 < len(starts) else None) for i, start in enumerate(starts)]
+
+
+def _run_segments(func, args_list):
+    """Run func over each argument tuple, in parallel when there is more than one."""
+    if len(args_list) == 1:
+        return [func(*args_list[0])]
+    with ThreadPoolExecutor(max_workers=len(args_list)) as executor:
+        return list(executor.map(lambda args: func(*args), args_list))
+
+
+def _infer_segment(input_path, pose, start, end, warmup_frames, sample_rate, inference_max_side):
+    """Pose inference for frames [start, end), after `warmup_frames` discarded frames for tracking."""
+    first = max(0, start - warmup_frames)
+    cap = _open_video(input_path, first)
+
+    def decode():
+        count = None if end is None else end - first
+        for offset, frame in enumerate(_read_frames(cap, count)):
+            index = first + offset
+            # sampling to speed up (set sample_rate=1 while debugging)
+            if index >= start and index % sample_rate != 0:
+                yield index, None
+            else:
+                # downscaled RGB copy for inference (landmarks are normalized)
+                yield index, prepare_inference_frame(frame, inference_max_side)
+
+    landmarks = []
+    analyzed = []
+
+    def infer(item):
+        index, image_rgb = item
+        if index < start:
+            pose.process(image_rgb)  # warm-up only: settles tracking, result discarded
+            return
+        if image_rgb is None:
+            landmarks.append(_NO_POSE)
+            analyzed.append(False)
+            return
+        results = pose.process(image_rgb)
+        landmarks.append(landmarks_to_array(results.pose_landmarks) if results.pose_landmarks else _NO_POSE)
+        analyzed.append(True)
+
+    try:
+        stats = run_pipeline("decode", decode(), [("infer", infer)])
+    finally:
+        cap.release()
+    return landmarks, analyzed, stats
+
+
+def is_segmented(input_path, segment_workers=SEGMENT_WORKERS):
+    """Whether the video is long enough to be processed as parallel segments."""
+    fps, frame_count, _ = video_info(input_path)
+    return len(plan_segments(frame_count, fps, segment_workers)) > 1
+
+
+def _flush_stats(flush_start):
+    return {"frames": 0, "busy_s": round(time.perf_counter() - flush_start, 3), "cpu_s": 0.0, "fps": None}
+
+
+def run_pose_inference(input_path, pose=None, sample_rate=1, inference_max_side=INFERENCE_MAX_SIDE,
+                       segment_workers=SEGMENT_WORKERS):
+    """
+    Decode the video and run pose inference on every `sample_rate`-th frame.
+    Pass a warm `pose` graph to reuse it; it is reset before use. Long videos
+    are split into `segment_workers` segments inferred in parallel (the extra
+    segments lease warm graphs kept by this process).
+
+    Returns a dict with landmarks (frames x 33 x 4 float32, NaN rows where no pose
+    was detected), timestamps (video seconds), analyzed (bool per frame), fps and
+    the per-stage pipeline stats (see run_pipeline).
+    """
+    fps, frame_count, _ = video_info(input_path)
+    segments = plan_segments(frame_count, fps, segment_workers)
+    warmup_frames = int(SEGMENT_OVERLAP_SECONDS * fps)
+
+    # Reuse a caller-provided (warm) Pose graph when given, otherwise lease one for this call
+    owns_pose = pose is None
+    if owns_pose:
+        pose = _lease_pose()
+    else:
+        reset_pose(pose)
+    poses = [pose] + [_lease_pose() for _ in segments[1:]]
+
+    started = time.perf_counter()
+    try:
+        parts = _run_segments(_infer_segment, [
+            (input_path, segment_pose, start, end, warmup_frames if start else 0, sample_rate, inference_max_side)
+            for segment_pose, (start, end) in zip(poses, segments)
+        ])
+    finally:
+        for index, segment_pose in enumerate(poses):
+            if index > 0 or owns_pose:
+                _release_pose(segment_pose)
+
+    landmarks = [row for part_landmarks, _, _ in parts for row in part_landmarks]
+    analyzed = [flag for _, part_analyzed, _ in parts for flag in part_analyzed]
+    if len(parts) == 1:
+        stats = parts[0][2]
+    else:
+        stats = {"segments": [part_stats for _, _, part_stats in parts],
+                 "wall_s": round(time.perf_counter() - started, 3)}
+
+    return {
+        "landmarks": np.stack(landmarks) if landmarks else np.empty((0, NUM_LANDMARKS, 4), np.float32),
+        "timestamps": np.arange(len(landmarks), dtype=np.float64) / fps,
+        "analyzed": np.array(analyzed, dtype=bool),
+        "fps": fps,
+        "pipeline_stats": stats
+    }
+
+
+def _render_segment(input_path, output_path, landmarks, records, draw_overlay, output_max_side,
+                    fps, size, start, end, faststart=True, hls_renditions=()):
+    """Draw and encode frames [start, end) into output_path (and an HLS ladder when hls_renditions is given)."""
+    cap = _open_video(input_path, start)
+    out = FFmpegWriter(output_path, fps, size, faststart=faststart, hls_dir=hls_dir_for(output_path),
+                       hls_renditions=hls_renditions)
+    end = len(records) if end is None else end
+
+    def decode():
+        for frame, frame_landmarks, record in zip(_read_frames(cap, end - start), landmarks[start:end],
+                                                  records[start:end]):
+            # draw on the BGR frame at output resolution
+            yield resize_max_side(frame, output_max_side), frame_landmarks, record
+
+    def draw(item):
+        image, frame_landmarks, record = item
+        if record is not None:
+            draw_overlay(image, array_to_landmarks(frame_landmarks), record)
+        return image
+
+    try:
+        stats = run_pipeline("decode", decode(), [("draw", draw), ("encode", out.write)])
+    except Exception:
+        out.abort()  # a truncated video must not be moved into place
+        raise
+    finally:
+        cap.release()
+        # ffmpeg finishes encoding the buffered frames after the pipe is closed
+        flush_start = time.perf_counter()
+        out.release()
+    stats["encode_flush"] = _flush_stats(flush_start)
+    return stats
+
+
+def run_annotated_inference(input_path, output_path, analyzer, draw_overlay, pose=None, sample_rate=1,
+                            inference_max_side=INFERENCE_MAX_SIDE, output_max_side=OUTPUT_MAX_SIDE,
+                            hls_renditions=HLS_RENDITIONS):
+    """
+    Single pass for rendered jobs: decode -> infer -> analyze + draw -> encode.
+    analyzer(index, frame_landmarks, timestamp, analyzed) returns a frame's overlay
+    record from the frames up to it (e.g. SquatFrameAnalyzer.update), or None to
+    copy the frame through unannotated. Pass a warm `pose` graph to reuse it; it is
+    reset before use. The video is not split into segments.
+
+    Returns the same dict as run_pose_inference; the pipeline stats also cover
+    drawing and encoding.
+    """
+    fps, _, (width, height) = video_info(input_path)
+    size = scaled_size(width, height, output_max_side)
+    renditions = hls_ladder(hls_renditions, size) if hls_renditions else ()
+
+    cap = _open_video(input_path)
+    out = FFmpegWriter(output_path, fps, size, hls_dir=hls_dir_for(output_path), hls_renditions=renditions)
+    owns_pose = pose is None
+    if owns_pose:
+        pose = _lease_pose()
+    else:
+        reset_pose(pose)
+    landmarks = []
+    analyzed = []
+
+    def decode():
+        for index, frame in enumerate(_read_frames(cap)):
+            # sampled frames get a downscaled RGB copy for inference; the overlay is drawn on the BGR frame
+            image_rgb = prepare_inference_frame(frame, inference_max_side) if index % sample_rate == 0 else None
+            yield index, resize_max_side(frame, output_max_side), image_rgb
+
+    def infer(item):
+        index, image, image_rgb = item
+        frame_landmarks = _NO_POSE
+        if image_rgb is not None:
+            results = pose.process(image_rgb)
+            if results.pose_landmarks:
+                frame_landmarks = landmarks_to_array(results.pose_landmarks)
+        landmarks.append(frame_landmarks)
+        analyzed.append(image_rgb is not None)
+        return index, image, frame_landmarks, image_rgb is not None
+
+    def draw(item):
+        index, image, frame_landmarks, was_analyzed = item
+        record = analyzer(index, frame_landmarks, index / fps, was_analyzed)
+        if record is not None:
+            draw_overlay(image, array_to_landmarks(frame_landmarks), record)
+        return image
+
+    try:
+        stats = run_pipeline("decode", decode(), [("infer", infer), ("draw", draw), ("encode", out.write)])
+    except Exception:
+        out.abort()  # a truncated video must not be moved into place
+        raise
+    finally:
+        cap.release()
+        if owns_pose:
+            _release_pose(pose)
+        # ffmpeg finishes encoding the buffered frames after the pipe is closed
+        flush_start = time.perf_counter()
+        out.release()
+    stats["encode_flush"] = _flush_stats(flush_start)
+    logger.debug(f"H.264 encoding complete: {output_path}")
+
+    return {
+        "landmarks": np.stack(landmarks) if landmarks else np.empty((0, NUM_LANDMARKS, 4), np.float32),
+        "timestamps": np.arange(len(landmarks), dtype=np.float64) / fps,
+        "analyzed": np.array(analyzed, dtype=bool),
+        "fps": fps,
+        "pipeline_stats": stats
+    }
+
+
+def render_annotated_video(input_path, output_path, landmarks, records, draw_overlay,
+                           output_max_side=OUTPUT_MAX_SIDE, segment_workers=SEGMENT_WORKERS,
+                           hls_renditions=HLS_RENDITIONS):
+    """
+    Decode the video again and draw each analyzed frame's overlay from its record,
+    streaming the result into H.264. Frames without a record are copied through
+    unannotated. Long videos are rendered as parallel segments that are joined
+    without re-encoding. Returns the per-stage pipeline stats.
+    """
+    fps, _, (width, height) = video_info(input_path)
+    size = scaled_size(width, height, output_max_side)
+    segments = plan_segments(len(records), fps, segment_workers)
+    renditions = hls_ladder(hls_renditions, size) if hls_renditions else ()
+
+    started = time.perf_counter()
+    if len(segments) == 1:
+        # the ladder is encoded by the same ffmpeg process, from the same frames
+        stats = _render_segment(input_path, output_path, landmarks, records, draw_overlay, output_max_side,
+                                fps, size, 0, None, hls_renditions=renditions)
+    else:
+        stem = os.path.splitext(output_path)[0]
+        part_paths = [f'{stem}_part{index}.mp4' for index in range(len(segments))]
+        try:
+            part_stats = _run_segments(_render_segment, [
+                (input_path, part_path, landmarks, records, draw_overlay, output_max_side, fps, size, start, end,
+                 False)
+                for part_path, (start, end) in zip(part_paths, segments)
+            ])
+            concat_videos(part_paths, output_path)
+        finally:
+            for part_path in part_paths:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+        stats = {"segments": part_stats}
+        if renditions:
+            # no segment writer sees the whole stream, so the ladder is encoded from the joined file
+            package_start = time.perf_counter()
+            package_hls(output_path, hls_dir_for(output_path), renditions, size)
+            stats["hls_package_s"] = round(time.perf_counter() - package_start, 3)
+        stats["wall_s"] = round(time.perf_counter() - started, 3)
+    logger.debug(f"H.264 encoding complete: {output_path}")
+    return stats
@@ -6,3 +6,10 @@ def client():
     app.config["TESTING"] = True
     with app.test_client() as client:
         yield client
+
+@pytest.fixture
+def processed_folder(tmp_path, monkeypatch):
+    """Serve /processed from a temporary directory"""
+    from optifit_backend import app as server
+    monkeypatch.setattr(server, "PROCESSED_FOLDER", str(tmp_path))
+    return tmp_path
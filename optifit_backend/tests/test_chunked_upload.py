@@ -0,0 +1,117 @@
+import io
+import os
+import threading
+import time
+import uuid
+
+import pytest
+from optifit_backend import app as server
+from optifit_backend.retention import RetentionManager
+from optifit_backend.uploads import ChunkedUploadStore, UploadSessionError
+
+CHUNK_SIZE = 256 * 1024
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """Capture queued jobs instead of running them"""
+    submitted = {}
+
+    def submit(job_id, input_path, *args):
+        with open(input_path, "rb") as f:
+            submitted[job_id] = f.read()
+        return 1
+
+    monkeypatch.setattr(server.job_queue, "submit", submit)
+    return submitted
+
+
+def _create(client, data):
+    response = client.post("/uploads", json={"filename": "set.mp4", "total_size": len(data),
+                                             "chunk_size": CHUNK_SIZE})
+    assert response.status_code == 201
+    return response.get_json()["upload_id"]
+
+
+def _put(client, upload_id, data, index):
+    chunk = data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+    return client.put(f"/uploads/{upload_id}/chunks/{index}", data=chunk)
+
+
+def test_chunked_upload_unknown_session(client):
+    response = client.get(f"/uploads/{uuid.uuid4()}")
+    assert response.status_code == 404
+
+
+def test_chunked_upload_resume_and_out_of_order_chunks(client, queued):
+    data = os.urandom(2 * CHUNK_SIZE + 1000)
+    upload_id = _create(client, data)
+
+    assert _put(client, upload_id, data, 2).status_code == 200
+    assert _put(client, upload_id, data, 0).status_code == 200
+    status = client.get(f"/uploads/{upload_id}").get_json()
+    assert status["received_chunks"] == [0, 2]
+    assert status["missing_chunks"] == [1]
+    assert client.post(f"/uploads/{upload_id}/complete").status_code == 409
+
+    # resending a received chunk is a no-op
+    assert _put(client, upload_id, data, 0).get_json()["received_chunks"] == [0, 2]
+    assert _put(client, upload_id, data, 1).get_json()["complete"] is True
+
+    response = client.post(f"/uploads/{upload_id}/complete")
+    assert response.status_code == 200
+    job_id = response.get_json()["job_id"]
+    assert queued[job_id] == data
+
+
+def test_chunked_upload_complete_twice_returns_same_job(client, queued):
+    data = os.urandom(CHUNK_SIZE + 10)
+    upload_id = _create(client, data)
+    _put(client, upload_id, data, 0)
+    _put(client, upload_id, data, 1)
+
+    responses = []
+
+    def complete():
+        with server.app.test_client() as thread_client:
+            responses.append(thread_client.post(f"/uploads/{upload_id}/complete"))
+
+    threads = [threading.Thread(target=complete) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.get_json()["job_id"] for response in responses}) == 1
+    assert len(queued) == 1
+
+
+def test_abandoned_session_expires_in_retention(tmp_path):
+    retention = RetentionManager(ttl_seconds=3600, max_bytes=10 * CHUNK_SIZE)
+    retention.start()
+    store = ChunkedUploadStore(str(tmp_path), 10 * CHUNK_SIZE, ttl_seconds=0.3, retention=retention)
+    upload_id = store.create("set.mp4", 2 * CHUNK_SIZE, CHUNK_SIZE)["upload_id"]
+    store.write_chunk(upload_id, 0, io.BytesIO(os.urandom(CHUNK_SIZE)))
+    assert retention.stats()["bytes"] == CHUNK_SIZE
+
+    # no new session is created: the retention thread removes the idle one
+    path = tmp_path / f".chunked_{upload_id}"
+    deadline = time.monotonic() + 5
+    while path.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not path.exists()
+    assert retention.stats()["bytes"] == 0
+    with pytest.raises(UploadSessionError):
+        store.status(upload_id)
+
+
+def test_finished_session_is_handed_to_its_job(tmp_path):
+    retention = RetentionManager(ttl_seconds=3600, max_bytes=10 * CHUNK_SIZE)
+    store = ChunkedUploadStore(str(tmp_path), 10 * CHUNK_SIZE, retention=retention)
+    upload_id = store.create("set.mp4", CHUNK_SIZE, CHUNK_SIZE)["upload_id"]
+    store.write_chunk(upload_id, 0, io.BytesIO(os.urandom(CHUNK_SIZE)))
+    store.finalize(upload_id, str(tmp_path / "set.mp4"))
+
+    assert (tmp_path / "set.mp4").stat().st_size == CHUNK_SIZE
+    assert retention.stats()["tracked_jobs"] == 0
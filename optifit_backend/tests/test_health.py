@@ -0,0 +1,4 @@
+def test_health_reports_storage(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert "storage" in response.get_json()
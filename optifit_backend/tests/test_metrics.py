@@ -0,0 +1,42 @@
+import io
+
+from optifit_backend import app as server
+from optifit_backend.metrics import MetricsRegistry
+
+
+def test_metrics(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert b"optifit_uploads_total" in response.data
+
+def test_metrics_render_format():
+    registry = MetricsRegistry("test")
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    registry.gauge("depth", "Depth", function=lambda: 7)
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE test_requests_total counter" in lines
+    assert 'test_requests_total{route="/a"} 3' in lines
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'test_latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "test_latency_seconds_count 3" in lines
+    assert "test_depth 7" in lines
+
+def test_metrics_count_uploads(client, monkeypatch):
+    monkeypatch.setattr(server.job_queue, "submit", lambda *args: 1)
+    before = server.uploads_total.value(method="multipart", outcome="queued")
+
+    response = client.post("/upload", data={"video": (io.BytesIO(b"Test video data"), "set.mp4"),
+                                            "render": "false"})
+    assert response.status_code == 200
+
+    assert server.uploads_total.value(method="multipart", outcome="queued") == before + 1
+    body = client.get("/metrics").get_data(as_text=True)
+    assert f'optifit_uploads_total{{method="multipart",outcome="queued"}} {before + 1}' in body
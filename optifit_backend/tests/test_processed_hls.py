@@ -0,0 +1,36 @@
+import os
+
+from optifit_backend import app as server
+from optifit_backend.video_encoder import HLS_MASTER_PLAYLIST, hls_dir_for
+
+
+def test_processed_hls_playlist_missing(client, processed_folder):
+    response = client.get("/processed/nonexistent_hls/master.m3u8")
+    assert response.status_code == 404
+
+def test_hls_dir_is_a_sibling_of_any_output():
+    assert hls_dir_for("processed/processed_squat_1_set.mp4") == "processed/processed_squat_1_set_hls"
+    assert hls_dir_for("processed/processed_squat_1_set.mov") == "processed/processed_squat_1_set_hls"
+
+def test_hls_request_renders_deferred_video(client, processed_folder, monkeypatch):
+    name = "processed_squat_1_lazy_set.mp4"
+    output_path = str(processed_folder / name)
+    rendered = []
+
+    def fake_render_squat_video(input_path, output_path):
+        rendered.append(output_path)
+        os.makedirs(hls_dir_for(output_path))
+        with open(os.path.join(hls_dir_for(output_path), HLS_MASTER_PLAYLIST), "w") as f:
+            f.write("#EXTM3U\n")
+        with open(output_path, "wb") as f:
+            f.write(b"Fake processed video data")
+
+    monkeypatch.setattr(server, "HLS_AVAILABLE", True)
+    monkeypatch.setattr(server, "render_squat_video", fake_render_squat_video)
+    monkeypatch.setitem(server.lazy_renders, name, {"exercise_type": "squat", "input_path": "set.mp4",
+                                                    "output_path": output_path})
+    response = client.get(f"/processed/processed_squat_1_lazy_set_hls/{HLS_MASTER_PLAYLIST}")
+    assert response.status_code == 200
+    assert response.data == b"#EXTM3U\n"
+    assert rendered == [output_path]
+    assert name not in server.lazy_renders
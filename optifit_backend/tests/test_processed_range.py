@@ -0,0 +1,33 @@
+import pytest
+from optifit_backend.app import PROCESSED_MAX_AGE
+
+
+@pytest.fixture
+def processed_file(processed_folder):
+    (processed_folder / "range_test.mp4").write_bytes(b"0123456789")
+    return "range_test.mp4"
+
+
+def test_processed_range(client, processed_file):
+    response = client.get(f"/processed/{processed_file}", headers={"Range": "bytes=2-5"})
+    assert response.status_code == 206
+    assert response.data == b"2345"
+    assert response.headers["Content-Range"] == "bytes 2-5/10"
+
+
+def test_processed_if_none_match(client, processed_file):
+    response = client.get(f"/processed/{processed_file}")
+    assert response.status_code == 200
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert f"max-age={PROCESSED_MAX_AGE}" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/processed/{processed_file}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_processed_partial_file_is_not_served(client, processed_folder):
+    # outputs are written under a hidden name until ffmpeg finished
+    (processed_folder / ".partial_test.mp4").write_bytes(b"01234")
+    assert client.get("/processed/.partial_test.mp4").status_code == 404
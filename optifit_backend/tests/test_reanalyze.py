@@ -0,0 +1,59 @@
+import uuid
+
+import numpy as np
+import pytest
+from optifit_backend import app as server
+from optifit_backend.landmark_store import save_landmarks
+from optifit_backend.squat_counter import SIDE_LANDMARKS
+
+
+@pytest.fixture
+def squat_job(tmp_path):
+    """A finished squat job whose stored knee angle swings between 180 and 80 degrees 10 times"""
+    frames, fps = 600, 30.0
+    landmarks = np.full((frames, 33, 4), 0.5, dtype=np.float32)
+    bend = np.radians(50 * (1 - np.cos(np.arange(frames) / fps * np.pi)))
+    for hip, knee, ankle in SIDE_LANDMARKS.values():
+        landmarks[:, hip, :2] = (0.5, 0.3)
+        landmarks[:, knee, :2] = (0.5, 0.5)
+        landmarks[:, ankle, 0] = 0.5 + 0.2 * np.sin(bend)
+        landmarks[:, ankle, 1] = 0.5 + 0.2 * np.cos(bend)
+    path = save_landmarks(str(tmp_path / "set_landmarks.npz"), landmarks, np.arange(frames) / fps,
+                          np.ones(frames, dtype=bool))
+
+    job_id = str(uuid.uuid4())
+    server.create_job(job_id, status="done", exercise_type="squat", landmarks_path=path)
+    yield job_id
+    server.forget_job(job_id)
+
+
+def test_reanalyze_unknown_job(client):
+    response = client.post(f"/reanalyze/{uuid.uuid4()}")
+    assert response.status_code == 404
+
+def test_reanalyze_with_new_thresholds(client, squat_job):
+    response = client.post(f"/reanalyze/{squat_job}")
+    assert response.status_code == 200
+    result = response.get_json()["result"]
+    assert result["squat_count"] == 10
+    assert result["reps_below_parallel"] == 0
+
+    response = client.post(f"/reanalyze/{squat_job}", json={"thresholds": {"DEPTH_THRESHOLD": 70}})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["thresholds"]["DEPTH_THRESHOLD"] == 70
+    assert body["result"]["squat_count"] == 10
+    assert body["result"]["reps_below_parallel"] == 10
+
+    # the descent never reaches 70 degrees, so no rep starts
+    response = client.post(f"/reanalyze/{squat_job}", json={"thresholds": {"START_DOWN_THRESHOLD": 70}})
+    assert response.get_json()["result"]["squat_count"] == 0
+
+def test_reanalyze_rejects_unknown_thresholds(client, squat_job):
+    response = client.post(f"/reanalyze/{squat_job}", json={"thresholds": {"KNEE_SPEED": 1}})
+    assert response.status_code == 400
+
+def test_landmarks_path_for_non_mp4_output():
+    from optifit_backend.landmark_store import landmarks_path_for
+    assert landmarks_path_for("processed/set.mov") == "processed/set_landmarks.npz"
+    assert landmarks_path_for("processed/set.mp4") == "processed/set_landmarks.npz"
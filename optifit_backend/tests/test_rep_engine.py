@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from optifit_backend.rep_engine import frame_records
+from optifit_backend.squat_counter import SIDE_LANDMARKS, SquatFrameAnalyzer, analyze_squat_frames
+from optifit_backend.pushup_counter import ARM_LANDMARKS, PushupFrameAnalyzer, analyze_pushup_frames
+
+
+def _oscillating_landmarks(joint_sets, frames=600, fps=30.0, seed=0):
+    """Random landmarks whose (a, b, c) joint angle swings between 180 and 80 degrees every 2 seconds"""
+    rng = np.random.default_rng(seed)
+    landmarks = rng.uniform(0.2, 0.8, size=(frames, 33, 4)).astype(np.float32)
+    bend = np.radians(50 * (1 - np.cos(np.arange(frames) / fps * np.pi)))
+    for a, b, c in joint_sets:
+        landmarks[:, a, :2] = (0.5, 0.3)
+        landmarks[:, b, :2] = (0.5, 0.5)
+        landmarks[:, c, 0] = 0.5 + 0.2 * np.sin(bend)
+        landmarks[:, c, 1] = 0.5 + 0.2 * np.cos(bend)
+    landmarks[rng.random(frames) < 0.05] = np.nan  # no pose detected
+    analyzed = rng.random(frames) > 0.1
+    return landmarks, np.arange(frames) / fps, analyzed
+
+
+def _assert_streamed_records_match(analyzer, columns, landmarks, timestamps, analyzed):
+    expected = frame_records(columns, analyzed)
+    streamed = [analyzer.update(i, landmarks[i], timestamps[i], analyzed[i]) for i in range(len(landmarks))]
+    for got, want in zip(streamed, expected):
+        if want is None:
+            assert got is None
+            continue
+        assert got.keys() == want.keys()
+        for key, value in want.items():
+            if isinstance(value, float):
+                assert got[key] == pytest.approx(value, rel=1e-5)
+            else:
+                assert got[key] == value
+    assert max(record["rep_count"] for record in expected if record) >= 5
+
+
+def test_squat_frame_analyzer_matches_whole_array_analysis():
+    landmarks, timestamps, analyzed = _oscillating_landmarks(SIDE_LANDMARKS.values())
+    columns, _ = analyze_squat_frames(landmarks, timestamps, analyzed)
+    _assert_streamed_records_match(SquatFrameAnalyzer(), columns, landmarks, timestamps, analyzed)
+
+
+def test_pushup_frame_analyzer_matches_whole_array_analysis():
+    landmarks, timestamps, analyzed = _oscillating_landmarks(ARM_LANDMARKS.values())
+    columns, _ = analyze_pushup_frames(landmarks, timestamps, analyzed)
+    _assert_streamed_records_match(PushupFrameAnalyzer(), columns, landmarks, timestamps, analyzed)
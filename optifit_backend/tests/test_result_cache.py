@@ -0,0 +1,42 @@
+from optifit_backend.result_cache import ResultCache, INDEX_FILENAME
+
+
+def test_cache_hit_does_not_rewrite_index(tmp_path):
+    cache = ResultCache(str(tmp_path), 1024 * 1024)
+    cache.put("a", {"squat_count": 1})
+    cache.put("b", {"squat_count": 2})
+    index_path = tmp_path / INDEX_FILENAME
+    before = index_path.read_bytes()
+
+    assert cache.get("a")["result"] == {"squat_count": 1}
+    assert index_path.read_bytes() == before
+
+
+def test_lru_order_of_hits_is_persisted_by_next_put(tmp_path):
+    cache = ResultCache(str(tmp_path), 1024 * 1024)
+    cache.put("a", {"squat_count": 1})
+    cache.put("b", {"squat_count": 2})
+    cache.get("a")
+    cache.put("c", {"squat_count": 3})
+
+    reloaded = ResultCache(str(tmp_path), 1024 * 1024)
+    assert list(reloaded._entries) == ["b", "a", "c"]
+
+
+def test_job_files_are_cached_and_evicted_with_the_result(tmp_path):
+    cache_dir = tmp_path / "cache"
+    landmarks = tmp_path / "set_landmarks.npz"
+    landmarks.write_bytes(b"l" * 100)
+    cache = ResultCache(str(cache_dir), 300)  # room for two entries with their files
+    cache.put("a:squat:1", {"squat_count": 1}, files={"landmarks": str(landmarks), "telemetry": None})
+
+    entry = ResultCache(str(cache_dir), 300).get("a:squat:1")
+    cached = cache.file_path(entry, "landmarks")
+    assert open(cached, "rb").read() == b"l" * 100
+    assert cache.file_path(entry, "telemetry") is None
+    assert cache.video_path(entry) is None
+
+    cache.put("b:squat:1", {"squat_count": 2}, files={"landmarks": str(landmarks)})
+    cache.put("c:squat:1", {"squat_count": 3}, files={"landmarks": str(landmarks)})
+    assert cache.get("a:squat:1") is None
+    assert not (cache_dir / "a_squat_1_landmarks.npz").exists()
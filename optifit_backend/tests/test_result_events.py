@@ -0,0 +1,65 @@
+import json
+import threading
+import time
+import uuid
+
+import pytest
+from optifit_backend import app as server
+
+
+@pytest.fixture
+def queued_job():
+    job_id = str(uuid.uuid4())
+    server.create_job(job_id, status="queued", exercise_type="squat")
+    yield job_id
+    server.forget_job(job_id)
+
+
+def _later(delay, *updates):
+    """Apply job updates from another thread, delay seconds apart"""
+    def run():
+        for job_id, fields in updates:
+            time.sleep(delay)
+            server.update_job(job_id, **fields)
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_result_events_unknown_job(client):
+    response = client.get(f"/result/{uuid.uuid4()}/events")
+    assert response.status_code == 404
+
+def test_result_events_order(client, queued_job):
+    thread = _later(0.1, (queued_job, {"status": "processing"}),
+                    (queued_job, {"status": "done", "result": {"squat_count": 3}}))
+    response = client.get(f"/result/{queued_job}/events")
+    body = response.get_data(as_text=True)
+    thread.join()
+
+    events = [dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+              for block in body.strip().split("\n\n") if not block.startswith(":")]
+    assert [event["event"] for event in events] == ["status", "status", "done"]
+    statuses = [json.loads(event["data"])["status"] for event in events]
+    assert statuses == ["queued", "processing", "done"]
+    assert json.loads(events[-1]["data"])["result"] == {"squat_count": 3}
+    versions = [int(event["id"]) for event in events]
+    assert versions == sorted(set(versions))
+
+def test_result_long_poll_wakes_on_change(client, queued_job):
+    version = client.get(f"/result/{queued_job}").get_json()["version"]
+    thread = _later(0.2, (queued_job, {"status": "processing"}))
+    start = time.monotonic()
+    response = client.get(f"/result/{queued_job}?wait=10&since={version}")
+    elapsed = time.monotonic() - start
+    thread.join()
+
+    assert response.get_json()["status"] == "processing"
+    assert response.get_json()["version"] > version
+    assert 0.1 < elapsed < 5
+
+def test_result_long_poll_times_out_without_change(client, queued_job):
+    start = time.monotonic()
+    response = client.get(f"/result/{queued_job}?wait=0.2")
+    assert time.monotonic() - start >= 0.2
+    assert response.get_json()["status"] == "queued"
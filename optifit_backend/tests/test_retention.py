@@ -0,0 +1,88 @@
+import os
+import time
+
+from optifit_backend.retention import RetentionManager
+
+
+def _write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_finished_job_expires_after_ttl(tmp_path):
+    evicted = []
+    retention = RetentionManager(ttl_seconds=0.2, max_bytes=10_000, on_evict=evicted.append)
+    retention.start()
+    video = _write(tmp_path / "a.mp4", 100)
+    retention.track("a", [video])
+    retention.finish("a")
+    assert retention.owner(video) == "a"
+
+    deadline = time.monotonic() + 5
+    while os.path.exists(video) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(video)
+    assert evicted == ["a"]
+    assert retention.owner(video) is None
+    assert retention.stats()["evicted"]["ttl"] == 1
+    assert retention.stats()["bytes"] == 0
+
+def test_busy_job_does_not_expire(tmp_path):
+    retention = RetentionManager(ttl_seconds=0.1, max_bytes=10_000)
+    retention.start()
+    upload = _write(tmp_path / "upload.mp4", 100)
+    retention.track("busy", [upload])
+    time.sleep(0.3)
+    assert os.path.exists(upload)
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    evicted = []
+    retention = RetentionManager(ttl_seconds=3600, max_bytes=350, on_evict=evicted.append)
+    paths = {}
+    for key in ("a", "b", "c"):
+        paths[key] = _write(tmp_path / f"{key}.mp4", 100)
+        retention.track(key, [paths[key]])
+    retention.finish("a")
+    retention.finish("b")
+    retention.touch("a")
+
+    # 500 bytes: "c" is still running, so the least recently used finished job ("b") goes first, then "a"
+    retention.finish("d", [_write(tmp_path / "d.mp4", 200)])
+    assert evicted == ["b", "a"]
+    assert not os.path.exists(paths["b"]) and not os.path.exists(paths["a"])
+    assert os.path.exists(paths["c"])
+    assert retention.stats()["bytes"] == 300
+    assert retention.stats()["evicted"]["quota"] == 2
+
+def test_finish_adds_outputs_and_directories(tmp_path):
+    retention = RetentionManager(ttl_seconds=3600, max_bytes=10_000)
+    upload = _write(tmp_path / "upload.mp4", 100)
+    hls_dir = tmp_path / "set_hls"
+    hls_dir.mkdir()
+    _write(hls_dir / "index.m3u8", 50)
+    retention.track("job", [upload])
+    retention.finish("job", [str(hls_dir)])
+
+    assert retention.stats()["bytes"] == 150
+    assert retention.owner(str(hls_dir / "index.m3u8")) == "job"
+    retention.discard("job")
+    assert not os.path.exists(upload) and not hls_dir.exists()
+    assert retention.stats()["bytes"] == 0
+
+def test_adopt_orphans_expire_by_mtime(tmp_path):
+    evicted = []
+    retention = RetentionManager(ttl_seconds=60, max_bytes=10_000, on_evict=evicted.append)
+    stale = _write(tmp_path / "stale.mp4", 100)
+    fresh = _write(tmp_path / "fresh.mp4", 100)
+    os.utime(stale, (time.time() - 120, time.time() - 120))
+    retention.adopt_orphans([str(tmp_path)])
+    retention.start()
+
+    deadline = time.monotonic() + 5
+    while os.path.exists(stale) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(stale)
+    assert os.path.exists(fresh)
+    # files of no known job do not call on_evict
+    assert evicted == []
@@ -0,0 +1,64 @@
+import csv
+import io
+import uuid
+
+import numpy as np
+import pytest
+from optifit_backend import app as server
+from optifit_backend.telemetry import load_telemetry, save_telemetry
+
+
+@pytest.fixture
+def telemetry_job(tmp_path):
+    columns = {
+        "knee_angle": np.array([170.0, np.nan, 95.5, 160.5]),
+        "stage": np.array(["up", None, "down", "up"], dtype=object),
+        "rep_count": np.array([0, 0, 0, 1]),
+        "knees_in": np.array([False, False, True, False])
+    }
+    path = save_telemetry(str(tmp_path / "set_telemetry.npz"), np.array([0.0, 0.0333, 0.0667, 0.1]),
+                          np.array([True, False, True, True]), columns, fps=30.0)
+    job_id = str(uuid.uuid4())
+    server.create_job(job_id, status="done", exercise_type="squat", telemetry_path=path)
+    yield job_id
+    server.forget_job(job_id)
+
+
+def test_telemetry_unknown_job(client):
+    response = client.get(f"/result/{uuid.uuid4()}/telemetry.csv")
+    assert response.status_code == 404
+
+def test_telemetry_round_trip(telemetry_job):
+    data = load_telemetry(server.jobs[telemetry_job]["telemetry_path"])
+    assert data["columns"]["stage"].tolist() == ["up", None, "down", "up"]
+    assert data["columns"]["rep_count"].dtype == np.int32
+    assert data["columns"]["knee_angle"].dtype == np.float32
+    assert data["meta"] == {"fps": 30.0}
+
+def test_telemetry_csv(client, telemetry_job):
+    response = client.get(f"/result/{telemetry_job}/telemetry.csv")
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    assert "set_telemetry.csv" in response.headers["Content-Disposition"]
+
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    # frames that were not analyzed are left out
+    assert rows == [
+        ["frame", "timestamp", "knee_angle", "stage", "rep_count", "knees_in"],
+        ["0", "0.000", "170.00", "up", "0", "False"],
+        ["2", "0.067", "95.50", "down", "0", "True"],
+        ["3", "0.100", "160.50", "up", "1", "False"]
+    ]
+
+def test_telemetry_npz(client, telemetry_job):
+    response = client.get(f"/result/{telemetry_job}/telemetry.npz")
+    assert response.status_code == 200
+    with np.load(io.BytesIO(response.data)) as data:
+        assert data["timestamps"].tolist() == [0.0, 0.0333, 0.0667, 0.1]
+
+def test_telemetry_path_does_not_collide_with_landmarks():
+    from optifit_backend.landmark_store import landmarks_path_for
+    from optifit_backend.telemetry import telemetry_path_for
+    for output_path in ("processed/set.mp4", "processed/set.mov"):
+        assert telemetry_path_for(output_path) == "processed/set_telemetry.npz"
+        assert telemetry_path_for(output_path) != landmarks_path_for(output_path)
@@ -0,0 +1,51 @@
+from optifit_backend import app as server
+from optifit_backend.timings import JobTimings, TimingAggregator
+
+
+def test_timings(client):
+    response = client.get("/timings")
+    assert response.status_code == 200
+    assert "stages" in response.get_json()
+
+def test_job_timings_add_pipeline():
+    timings = JobTimings()
+    timings.add_pipeline("inference", {
+        "wall_s": 2.0,
+        "decode": {"busy_s": 0.5, "cpu_s": 0.4, "frames": 100},
+        "infer": {"busy_s": 1.5, "cpu_s": 1.2, "frames": 100}
+    })
+    with timings.stage("analysis", frames=100):
+        pass
+
+    stages = timings.as_dict()["stages"]
+    assert stages["inference"] == {"wall_s": 2.0, "cpu_s": 0.0, "frames": 100, "fps": 50.0}
+    assert stages["inference.infer"] == {"wall_s": 1.5, "cpu_s": 1.2, "frames": 100, "fps": 66.7}
+    assert stages["inference.decode"]["frames"] == 100
+    assert stages["analysis"]["frames"] == 100
+
+def test_timings_sums_finished_jobs(client):
+    before = client.get("/timings").get_json()
+    job = {"stages": {"test.stage": {"wall_s": 1.0, "cpu_s": 0.5, "frames": 30}}, "job_wall_s": 1.5}
+    server.timing_stats.add(job)
+    server.timing_stats.add(job)
+
+    after = client.get("/timings").get_json()
+    assert after["jobs"] == before["jobs"] + 2
+    assert after["stages"]["test.stage"] == {"jobs": 2, "wall_s": 2.0, "mean_wall_s": 1.0, "cpu_s": 1.0,
+                                             "frames": 60, "fps": 30.0}
+    assert "job_wall_s" in after["mean"]
+
+def test_timings_means_count_only_jobs_with_the_stage():
+    aggregator = TimingAggregator()
+    rendered = {"stages": {"inference": {"wall_s": 4.0, "cpu_s": 3.0, "frames": 100},
+                           "render": {"wall_s": 2.0, "cpu_s": 1.0, "frames": 100}},
+                "queue_wait_s": 1.0, "job_wall_s": 6.0}
+    analysis_only = {"stages": {"inference": {"wall_s": 2.0, "cpu_s": 1.0, "frames": 100}}, "job_wall_s": 2.0}
+    aggregator.add(rendered)
+    aggregator.add(analysis_only)
+
+    snapshot = aggregator.snapshot()
+    assert snapshot["jobs"] == 2
+    assert snapshot["stages"]["inference"]["mean_wall_s"] == 3.0
+    assert snapshot["stages"]["render"]["mean_wall_s"] == 2.0
+    assert snapshot["mean"] == {"queue_wait_s": 1.0, "job_wall_s": 4.0}
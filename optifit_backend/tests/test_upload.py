@@ -21,6 +21,16 @@ def test_uploading_video(client, tmp_path, monkeypatch):
 
     assert response.status_code == 200
     json_data = response.get_json()
-    assert json_data["status"] == "processing"
+    assert json_data["status"] == "queued"
     assert "job_id" in json_data
     assert "video_url" in json_data
+
+def test_non_mp4_upload_is_served_as_mp4(client):
+    response = client.post(
+        "/upload",
+        data={"video": (io.BytesIO(b"Test video data"), "test_video.mov"), "render": "false"}
+    )
+
+    assert response.status_code == 200
+    video_url = response.get_json()["video_url"]
+    assert video_url.endswith("_test_video.mp4")